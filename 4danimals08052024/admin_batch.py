@@ -0,0 +1,90 @@
+import os
+
+import db_pool
+
+# Most ids accepted by one batch call
+MAX_BATCH_IDS = int(os.environ.get('ADMIN_MAX_BATCH_IDS', '5000'))
+# Ids per 'IN (...)' lookup, well below SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+# Ids are SQLite INTEGER PRIMARY KEYs: positive and within 64 bits
+MAX_ID = 2 ** 63 - 1
+
+# Tables the batch actions may touch. Approval sets a different flag per table, tables without one cannot be approved.
+APPROVAL_COLUMNS = {'applicants': 'approved', 'volunteers': 'can_be_foster'}
+DELETABLE_TABLES = ('animal', 'applicants', 'volunteers')
+
+
+class BatchError(ValueError):
+    """
+    Raised for a batch request that cannot be run: unknown table or a malformed id list.
+    """
+
+
+def parse_ids(payload):
+    """
+    The function returns the ids of a batch request as a list of distinct integers, in the order given.
+    The payload is the decoded JSON body: either a list of ids or an object with an 'ids' list.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get('ids')
+    if not isinstance(payload, list) or not payload:
+        raise BatchError('Expected a non-empty JSON list of ids, or {"ids": [...]}')
+    if len(payload) > MAX_BATCH_IDS:
+        raise BatchError(f'At most {MAX_BATCH_IDS} ids per call')
+    ids = []
+    for value in payload:
+        # bool is an int subclass, but true / false are not ids
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise BatchError(f'Invalid id: {value!r}')
+        digits = str(value).strip()
+        # isdigit() alone takes non-ASCII digits such as '²' that int() rejects, and the length check keeps
+        # int() away from huge strings (beyond sys.get_int_max_str_digits() it raises ValueError)
+        if (not (digits.isascii() and digits.isdigit()) or len(digits) > len(str(MAX_ID))
+                or not 1 <= int(digits) <= MAX_ID):
+            raise BatchError(f'Invalid id: {value!r}')
+        ids.append(int(digits))
+    return list(dict.fromkeys(ids))
+
+
+def _existing_ids(conn, table, ids):
+    found = set()
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        chunk = ids[start:start + LOOKUP_CHUNK]
+        rows = conn.execute(f'SELECT id FROM {table} WHERE id IN ({", ".join("?" * len(chunk))})', chunk)
+        found.update(row[0] for row in rows)
+    return [id for id in ids if id in found]
+
+
+def _run(table, statement, ids):
+    """
+    The function runs a parameterized statement for every id with one executemany, in one write transaction,
+    and returns the ids it applied to and the ones that do not exist.
+    The lookup and the write share the transaction, so the reported ids are exactly the rows written.
+    """
+    with db_pool.get_pool().connection() as conn:
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            affected = _existing_ids(conn, table, ids)
+            conn.executemany(statement, [(id,) for id in affected])
+    missing = sorted(set(ids) - set(affected))
+    return {'table': table, 'requested': len(ids), 'affected': len(affected), 'ids': affected, 'missing': missing}
+
+
+def approve(table, ids):
+    """
+    The function sets the approval flag of the table (see APPROVAL_COLUMNS) on every given id.
+    """
+    table = table.lower()
+    if table not in APPROVAL_COLUMNS:
+        raise BatchError(f'Table {table} cannot be approved')
+    return _run(table, f'UPDATE {table} SET {APPROVAL_COLUMNS[table]} = 1 WHERE id = ?', ids)
+
+
+def delete(table, ids):
+    """
+    The function deletes every given id from the table.
+    """
+    table = table.lower()
+    if table not in DELETABLE_TABLES:
+        raise BatchError(f'Table {table} not found')
+    return _run(table, f'DELETE FROM {table} WHERE id = ?', ids)
@@ -1,59 +1,99 @@
 from flask import Flask, render_template, request, redirect, url_for, jsonify, Response
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
-from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import CONTENT_TYPE_LATEST
 from datetime import datetime
-import sqlite3, hashlib
+from time import time
+import hashlib
+import logging
 from validate_fileds import validate_form
+import admin_batch
+import app_logging
+import bulk_import
+import compression
+import conditional
+import db_pool
+import health
+import monitoring
+import pagination
+import response_cache
+import search
+import serializers
+import sql_trace
+import table_export
+import table_query
+import tracing
+import write_queue
 import os
 
 app = Flask(__name__)
-# Get the base directory of the application
-basedir = os.path.abspath(os.path.dirname(__file__))
-# Set the database URI to use the root folder
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, '4danimals.db')
+# JSON log lines through a per-process queue, with the request id of every request (X-Request-ID)
+app_logging.init_app(app)
+forms_log = logging.getLogger('app.forms')
+# Sampled request traces (form parsing, validation, SQL, templates) as OTLP/JSON lines when TRACE_FILE is set
+tracing.init_app(app)
+# jsonify and every JSON route encode with orjson when it is installed, dates as ISO 8601
+app.json = serializers.JSONProvider(app)
+# Set the database URI to the shared database path, both data-access paths use the same file and tuning profile
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_pool.DB_PATH
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_pool.engine_options()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
-
-REQUEST_COUNTER = Counter(
-    'http_requests_total',
-    'Total HTTP Requests (by status and method)',
-    ['method', 'endpoint', 'status']
-)
+with app.app_context():
+    db_pool.instrument_engine(db.engine)
 
 #runs before any REST API request is handled, saves aside the start time
 @app.before_request
 def before_request_func():
     """
     This function runs before each request and records the start time.
+    It also counts the request as in flight and resets the per-request SQL statement list.
     """
     request._prometheus_metrics_request_start_time = time()
+    request._prometheus_metrics_in_flight = True
+    monitoring.REQUESTS_IN_FLIGHT.inc()
+    sql_trace.start_request()
 
 #runs after any REST API request is handled, calculates latency and counts relevant stats
 @app.after_request
 def after_request(response):
     """
     The dunction calculates the latency by subtracting the recorded start time from the current time.
-    Then, it increments the REQUEST_COUNTER metric for the appropriate labels derived from the request and response
-    details: HTTP method, the endpoint accessed, and the HTTP status code of the response.
-    The response object is then returned, unchanged.
+    Then, it records the request metrics (see monitoring.observe_request) for the appropriate labels derived from the
+    request and response details: HTTP method, the endpoint accessed, and the HTTP status code of the response,
+    together with the request latency, the request / response sizes and the time spent in SQL statements.
+    Finally the slow statements of the request go to the slow-query log and the SQL totals are added to the
+    response as a Server-Timing header, the response is otherwise returned unchanged.
     """
     request_latency = time() - request._prometheus_metrics_request_start_time
-    REQUEST_COUNTER.labels(
-        method=request.method,
-        endpoint=request.endpoint,
-        status=response.status_code
-    ).inc()
-    return response
+    monitoring.observe_request(request, response, request_latency)
+    return sql_trace.finish_request(response, request_latency)
+
+#runs after every request, even one that failed with an exception
+@app.teardown_request
+def teardown_request_func(exception):
+    """
+    This function takes the request out of the in-flight gauge.
+    """
+    if getattr(request, '_prometheus_metrics_in_flight', False):
+        monitoring.REQUESTS_IN_FLIGHT.dec()
+
+# Compress text responses and serve static files with content-hashed, long-lived URLs.
+# Registered after after_request above, so it runs before it and the metrics see the compressed size.
+compression.init_app(app)
+
+# Liveness (/healthz) and readiness (/readyz) probes, see k8s/app-deployment.yml
+health.init_app(app)
 
 #the route that Prometheus will hit to scrape metrics
 @app.route('/metrics')
 def metrics():
     """
     The function returns the latest metrics data in the proper format (CONTENT_TYPE_LATEST) expected by Prometheus.
+    Under gunicorn with PROMETHEUS_MULTIPROC_DIR set, the data is aggregated over every live worker of the pod.
     """
-    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+    return Response(monitoring.generate_metrics(), mimetype=CONTENT_TYPE_LATEST)
 
 
 # Define the Animal model
@@ -96,12 +136,38 @@ class Volunteers(db.Model):
     can_be_foster = db.Column(db.Boolean)
     animal_fostered = db.Column(db.String(255))
 
+def save_new(instance, table):
+    """
+    The function stores a new model instance and drops the cached pages of its table.
+    With the write queue enabled (WRITE_QUEUE=1) the row is committed in a group with the concurrent writes of this
+    process, otherwise through the session as one transaction of its own. The values are converted exactly like the
+    session does (dates, booleans), and Python-side column defaults are applied.
+    """
+    if not write_queue.ENABLED:
+        db.session.add(instance)
+        db.session.commit()
+    else:
+        dialect = db.engine.dialect
+        values = {}
+        for column in instance.__table__.columns:
+            value = getattr(instance, column.key)
+            if value is None and column.default is not None:
+                value = column.default.arg(None) if column.default.is_callable else column.default.arg
+            if value is None:
+                continue
+            processor = column.type.dialect_impl(dialect).bind_processor(dialect)
+            values[column.name] = processor(value) if processor else value
+        instance.id = write_queue.insert(instance.__tablename__, values)
+    response_cache.invalidate(table)
+
+# Tables the admin API is allowed to touch
+ADMIN_TABLES = ('animal', 'applicants', 'volunteers')
+
 
 def convert_to_datetime(text_date):
     """
     Convert a date string in the format 'YYYY-MM-DD' to a datetime object.
     """
-    print(str(text_date))
     try:
         # Use strptime to parse the date string with specific format
         date_obj = datetime.strptime(str(text_date), "%Y-%m-%d")
@@ -114,24 +180,23 @@ def index():
     return render_template('index.html')
 
 @app.route('/view-volunteers', methods=['GET', 'POST'])
+@conditional.etagged('volunteers')
+@response_cache.cached('volunteers')
 def view_volunteers():
     """
     This function responds to both GET and POST requests at the '/view-volunteers' route.
-    For a GET request, it fetches all volunteers from the database and renders them on a web page.
+    For a GET request, it fetches a page of volunteers from the database and renders them on a web page.
     For a POST request, it applies filters received from a form submission to query specific volunteers
     and displays them accordingly.
+    Both are keyset paginated on id, the 'after' / 'before' request values carry the cursor.
     """
+    after, before, page_size = pagination.page_args(request.values)
     if request.method == 'GET':
-        # Connect to your SQL database
-        conn = sqlite3.connect('4danimals.db')
-        cur = conn.cursor()
-        # Query for available volunteers
-        cur.execute("SELECT * FROM Volunteers")
-        volunteers = cur.fetchall()
-        # Close the connection
-        conn.close()
+        # Borrow a connection from the pool and query for a page of available volunteers
+        with db_pool.get_pool().connection() as conn:
+            page = pagination.paginate_table(conn, 'Volunteers', after, before, page_size)
         # Render the HTML page with the volunteers data
-        return render_template('view-volunteers.html', volunteers=volunteers) #animals=animals)
+        return render_template('view-volunteers.html', volunteers=page.items, page=page, filters={})
 
     elif request.method == 'POST':
         # Extract filter values from the form
@@ -146,35 +211,36 @@ def view_volunteers():
         if city:
             query = query.filter(Volunteers.city == city)
         if can_be_foster:
-            query = query.filter(Volunteers.can_be_foster == '1')
-        volunteers = query.all()
+            query = query.filter(Volunteers.can_be_foster == True)
+        page = pagination.paginate_query(query, Volunteers.id, after, before, page_size)
     else:
-        # If it's a GET request, just display all volunteers initially
-        volunteers = Volunteers.query.all()
+        # If it's a GET request, just display the first page of volunteers initially
+        page = pagination.paginate_query(Volunteers.query, Volunteers.id, page_size=page_size)
 
-    return render_template('view-volunteers.html', volunteers=volunteers)
+    return render_template('view-volunteers.html', volunteers=page.items, page=page,
+                           filters=pagination.filter_values(request.form))
 
 @app.route('/view-animals', methods=['GET', 'POST'])
+@conditional.etagged('animal')
+@response_cache.cached('animal')
 def view_animals():
     """
-    For a GET request, this function retrieves all animals from the database and renders them on a web page.
+    For a GET request, this function retrieves a page of animals from the database and renders them on a web page.
     For a POST request, it filters the animals based on form submission parameters such as gender, age range,
     species, breed, and whether they are spayed or neutered, then displays the filtered list.
+    Species and breed match anywhere in the column, case-insensitively ('retriever' finds 'Golden Retriever' and
+    'Goldenretriever'), from the animal_trigram index. The free-text search box 'q' goes through the animal_fts
+    full-text index (word prefixes) and is ordered by relevance.
+    Both are keyset paginated on id, the 'after' / 'before' request values carry the cursor.
     """
+    after, before, page_size = pagination.page_args(request.values)
     if request.method == 'GET':
-        # Connect to your SQL database
-        conn = sqlite3.connect('4danimals.db')
-        cur = conn.cursor()
-
-        # Query for available animals
-        cur.execute("SELECT * FROM Animal")
-        animals = cur.fetchall()
-
-        # Close the connection
-        conn.close()
+        # Borrow a connection from the pool and query for a page of available animals
+        with db_pool.get_pool().connection() as conn:
+            page = pagination.paginate_table(conn, 'Animal', after, before, page_size)
 
         # Render the HTML page with the animals data
-        return render_template('view-animals.html', table_name=Animal) #animals=animals)
+        return render_template('view-animals.html', animals=page.items, page=page, filters={})
 
     elif request.method == 'POST':
         # Extract filter values from the form
@@ -183,6 +249,7 @@ def view_animals():
         age_max = request.form.get('age_max')
         species = request.form.get('species')
         breed = request.form.get('breed')
+        q = request.form.get('q')
         spayed_neutered = request.form.get('spayed_neutered') == '1'
 
         # Construct query based on filters
@@ -193,41 +260,43 @@ def view_animals():
             query = query.filter(Animal.age >= age_min)
         if age_max:
             query = query.filter(Animal.age <= age_max)
-        if species:
-            query = query.filter(Animal.species.ilike(f'%{species}%'))
-        if breed:
-            query = query.filter(Animal.breed.ilike(f'%{breed}%'))
+        query = query.filter(*search.substring_filters(Animal, species=species, breed_name=breed))
+        match = search.match_expression(q=q)
+        if match:
+            fts = search.fts_ranking(match)
+            query = query.join(fts, fts.c.id == Animal.id)
         if spayed_neutered:
             query = query.filter(Animal.spayed_neutered == spayed_neutered)
-        animals = query.all()
+        if match:
+            query = query.add_columns(fts.c.score)
+            page = pagination.paginate_ranked(query, fts.c.score, Animal.id, after, before, page_size)
+        else:
+            page = pagination.paginate_query(query, Animal.id, after, before, page_size)
     else:
-        # If it's a GET request, just display all animals initially
-        animals = Animal.query.all()
+        # If it's a GET request, just display the first page of animals initially
+        page = pagination.paginate_query(Animal.query, Animal.id, page_size=page_size)
 
-    return render_template('view-animals.html', animals=animals)
+    return render_template('view-animals.html', animals=page.items, page=page,
+                           filters=pagination.filter_values(request.form))
 
 @app.route('/view-adopters', methods=['GET', 'POST'])
+@conditional.etagged('applicants')
+@response_cache.cached('applicants')
 def view_adopters():
     """
-    For a GET request, this function retrieves all adopters from the database and renders them on a web page.
+    For a GET request, this function retrieves a page of adopters from the database and renders them on a web page.
     For a POST request, it filters the adopters based on form submission parameters such as the type of animal owned,
     city, and whether their application has been approved, then displays the filtered list.
-
+    Both are keyset paginated on id, the 'after' / 'before' request values carry the cursor.
     """
+    after, before, page_size = pagination.page_args(request.values)
     if request.method == 'GET':
-        # Connect to your SQL database
-        conn = sqlite3.connect('4danimals.db')
-        cur = conn.cursor()
-
-        # Query for available adopters
-        cur.execute("SELECT * FROM Applicants")
-        applicants = cur.fetchall()
-
-        # Close the connection
-        conn.close()
+        # Borrow a connection from the pool and query for a page of available adopters
+        with db_pool.get_pool().connection() as conn:
+            page = pagination.paginate_table(conn, 'Applicants', after, before, page_size)
 
         # Render the HTML page with the adopters data
-        return render_template('view-adopters.html', applicants=applicants)
+        return render_template('view-adopters.html', adopters=page.items, page=page, filters={})
 
     elif request.method == 'POST':
         # Extract filter values from the form
@@ -242,13 +311,14 @@ def view_adopters():
         if city:
             query = query.filter(Applicants.city == city)
         if approved:
-            query = query.filter(Applicants.approved == '1')
-        applicants = query.all()
+            query = query.filter(Applicants.approved == True)
+        page = pagination.paginate_query(query, Applicants.id, after, before, page_size)
     else:
-        # If it's a GET request, just display all applicants initially
-        applicants = Applicants.query.all()
+        # If it's a GET request, just display the first page of applicants initially
+        page = pagination.paginate_query(Applicants.query, Applicants.id, page_size=page_size)
 
-    return render_template('view-adopters.html', applicants=applicants)
+    return render_template('view-adopters.html', adopters=page.items, page=page,
+                           filters=pagination.filter_values(request.form))
 
 @app.route('/add-animal', methods=['GET', 'POST'])
 def add_animal():
@@ -299,20 +369,22 @@ def add_animal():
             try:
                 if new_animal.birth_date:
                     animal_data["birth_date"]["value"] = new_animal.birth_date.strftime("%Y-%m-%d")
-            except :
-                print("do nothing")
-            validate, errors = validate_form(**animal_data)
+            except (AttributeError, ValueError):
+                # Left empty, validate_form treats the optional birth date as missing
+                forms_log.debug('Animal birth date not formatted')
+            with tracing.span('validate_form'):
+                validate, errors = validate_form(**animal_data)
             if validate:
                 refill = False
-                # Add the new animal to the session and commit it to the database
+                # Store the new animal in the database
                 # Animal.arrival = convert_to_datetime(Animal.arrival)
                 # Animal.birth_date = convert_to_datetime(Animal.Animal.birth_date)
-                db.session.add(new_animal)
-                db.session.commit()
+                save_new(new_animal, 'animal')
                 # Redirect to a new URL, or render a template with a success message
                 return redirect(url_for('index'))  # Redirect back to the home page or a confirmation page
             else:
-                print(",".join(errors))
+                # The messages name the failing fields, never the submitted values
+                forms_log.debug('Animal form rejected', extra={'errors': errors})
                 return render_template('add-animal.html', animal_data=animal_data, errors=errors)
 
     elif request.method == 'GET':
@@ -332,7 +404,7 @@ def add_adopter():
         # Create a new Animal instance using the form data
         new_adopter = Applicants(
             full_name=request.form['full_name'],
-            Teudat_Zehut=request.form['teudat_zehut'],
+            teudat_zehut=request.form['teudat_zehut'],
             address=request.form['address'] if request.form['address'] else None,
             city=request.form['city'] if request.form['city'] else None,
             mail=request.form['mail'] if request.form['mail'] else None,
@@ -341,9 +413,8 @@ def add_adopter():
             owner_of=request.form['owner_of'] if request.form['owner_of'] else None
         )
 
-        # Add the new animal to the session and commit it to the database
-        db.session.add(new_adopter)
-        db.session.commit()
+        # Store the new adopter in the database
+        save_new(new_adopter, 'applicants')
 
         # Redirect to a new URL, or render a template with a success message
         return redirect(url_for('index'))  # Redirect back to the home page or a confirmation page
@@ -374,9 +445,8 @@ def new_volunteer():
             animal_fostered=request.form['animal_fostered'] if request.form['animal_fostered'] else None
         )
 
-        # Add the new animal to the session and commit it to the database
-        db.session.add(new_volunteer)
-        db.session.commit()
+        # Store the new volunteer in the database
+        save_new(new_volunteer, 'volunteers')
 
         # Redirect to a new URL, or render a template with a success message
         return redirect(url_for('index'))  # Redirect back to the home page or a confirmation page
@@ -426,32 +496,81 @@ def admin():
     return render_template('admin.html')
 
 @app.route('/admin/get_table_data/<table>', methods=['GET'])
+@conditional.etagged('*')
+@response_cache.cached('*')
 def get_table_data(table):
     """
-    The function retrieves and returns all data from a specified database table as JSON.
-    This function connects to an SQLite database, fetches all entries from the specified table, and then
-    converts this data into a JSON-compatible format using a list of dictionaries where each dictionary
-    represents a row in the table. The function handles GET requests and is intended for administrative purposes
-    to view table contents directly.
-    """
-    # Connect to the SQLite database
-    conn = sqlite3.connect('4danimals.db')
-    c = conn.cursor()
-
-    # Fetch data from the specified table
-    c.execute(f'SELECT * FROM {table}')
-    data = c.fetchall()
-
-    # Close the database connection
-    conn.close()
+    The function retrieves and returns data from a specified database table as JSON.
+    The query parameters select what is returned (see table_query.parse): column projection ('columns'),
+    equality and '_min' / '_max' range filters, 'sort', and the 'limit' / 'offset' or 'after' window.
+    They are validated against the table's columns and compiled into parameterized SQL run on a pooled SQLite
+    connection, so only the requested rows and columns are read and sent. The JSON is a list of dictionaries where
+    each dictionary represents a row, or with '?shape=columnar' {"columns": [...], "rows": [[...], ...]}.
+    Clients that accept application/msgpack (or ask for '?format=msgpack') get the same payload as MessagePack.
+    A 'Link: <...>; rel="next"' header points to the next page when there is one.
+    The function handles GET requests and is intended for administrative purposes to view table contents directly.
+    With '?format=ndjson|csv' (or a matching Accept header) the rows are instead streamed in fixed-size batches,
+    so large exports run in constant memory and start sending right away.
+    """
+    if table.lower() not in ADMIN_TABLES:
+        return jsonify({"error": f"Table {table} not found"}), 404
+
+    fmt = table_export.export_format(request)
+    try:
+        query = table_query.parse(table, request.args, paged=fmt is None)
+    except table_query.QueryError as error:
+        return jsonify({"error": str(error)}), 400
+    if fmt:
+        chunks, mimetype = table_export.stream_table(query, fmt)
+        return Response(chunks, mimetype=mimetype)
+
+    # Borrow a connection from the pool and fetch the page, plus one row telling whether another page follows.
+    # Plain tuples instead of sqlite3.Row, the serializers encode them directly.
+    sql, params = query.statement(extra=1)
+    with db_pool.get_pool().connection() as conn:
+        c = conn.cursor()
+        c.row_factory = None
+        c.execute(sql, params)
+        data = c.fetchall()
+
+    # The column names are the same for every row, 'shape=columnar' sends them once instead of in every row
+    columns = [column[0] for column in c.description]
+    table_data = serializers.table_payload(columns, data[:query.limit], serializers.table_shape())
+
+    # Return the table data as JSON, or MessagePack when the client asks for it
+    response = serializers.respond(table_data)
+    next_args = query.next_args(data)
+    if next_args:
+        args = request.args.to_dict(flat=False)
+        args.update(next_args)
+        response.headers['Link'] = f'<{url_for("get_table_data", table=table, **args)}>; rel="next"'
+    return response
 
-    # Convert the data to a list of dictionaries for JSON serialization
-    table_data = []
-    for row in data:
-        table_data.append(dict(zip([column[0] for column in c.description], row)))
+@app.route('/admin/bulk-import/<table>', methods=['POST'])
+def bulk_import_table(table):
+    """
+    The function loads many records at once from a CSV or NDJSON upload (multipart field 'file', or the raw body).
+    Rows are parsed as a stream, validated with the validate_fileds rules of the table and inserted in batched
+    executemany transactions. It returns a JSON report with the inserted / rejected counts and the errors per line.
+    An upload that stops being readable part way (invalid UTF-8, broken CSV quoting) is answered with 400 when
+    nothing was committed, else with the report of the committed batches marked incomplete.
+    """
+    table = table.lower()
+    if table not in ADMIN_TABLES:
+        return jsonify({"error": f"Table {table} not found"}), 404
 
-    # Return the table data as JSON
-    return jsonify(table_data)
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    fmt = bulk_import.import_format(request, upload)
+    batch_size = bulk_import.batch_size_arg(request.args)
+    try:
+        report = bulk_import.import_records(table, bulk_import.iter_records(stream, fmt), batch_size)
+    finally:
+        # Batches committed before a failure are in the table too
+        response_cache.invalidate(table)
+    if report.aborted and not report.inserted:
+        return serializers.respond(report.as_dict(), status=400)
+    return serializers.respond(report.as_dict())
 
 #THIS PART WAS LEFT HERE FOR PROJECT DOCUMENTATION PURPOSES ONLY, UNDER NORMAL CURCEMSTANCES IT SHOULD BE GONE!
 # user_name for log-in into admin section: "admin"
@@ -490,51 +609,67 @@ def login():
     elif request.method == 'GET':
         return render_template('login.html')
 
-@app.route('/admin/approve/<table>/<id>', methods=['PUT'])
+@app.route('/admin/approve/<table>', methods=['PUT', 'POST'])
+def approve_batch(table):
+    """
+    The function approves many entries of the specified table in one call.
+    The JSON body is a list of ids (or {"ids": [...]}), they are all updated with one parameterized executemany
+    in a single transaction. It returns the ids that were approved and the ones that were not found.
+    """
+    try:
+        result = admin_batch.approve(table, admin_batch.parse_ids(request.get_json(silent=True)))
+    except admin_batch.BatchError as error:
+        return jsonify({"error": str(error)}), 400
+    response_cache.invalidate(table)
+    return serializers.respond(result)
+
+@app.route('/admin/delete/<table>', methods=['DELETE', 'POST'])
+def delete_batch(table):
+    """
+    The function deletes many entries of the specified table in one call.
+    The JSON body is a list of ids (or {"ids": [...]}), they are all deleted with one parameterized executemany
+    in a single transaction. It returns the ids that were deleted and the ones that were not found.
+    """
+    try:
+        result = admin_batch.delete(table, admin_batch.parse_ids(request.get_json(silent=True)))
+    except admin_batch.BatchError as error:
+        return jsonify({"error": str(error)}), 400
+    response_cache.invalidate(table)
+    return serializers.respond(result)
+
+@app.route('/admin/approve/<table>/<int:id>', methods=['PUT'])
 def approve(table, id):
     """
     The function updates the approval status of an entry in the specified table using a PUT request.
-    This function connects to an SQLite database to update the 'approved' status of an entry, identified by an ID,
-    in a specified table. It supports different approval fields for different tables: 'approved' for applicants
+    It supports different approval fields for different tables: 'approved' for applicants
     and 'can_be_foster' for volunteers. If the specified table is not supported, it returns an error.
+    It is the one-id form of approve_batch.
     """
-    # Connect to the SQLite database
-    conn = sqlite3.connect('4danimals.db')
-    c = conn.cursor()
-
-    # Update the 'approved' status of the adopter with the specified ID
-    if table == 'applicants':
-        approved = 'approved'
-    elif table == 'volunteers':
-        approved = 'can_be_foster'
-    else:
-        return jsonify({"error": f"Table {table} not found"})
-    c.execute(f'UPDATE {table} SET {approved} = True WHERE id = {id}')
-    conn.commit()
-    conn.close()
+    try:
+        result = admin_batch.approve(table, [id])
+    except admin_batch.BatchError as error:
+        return jsonify({"error": str(error)}), 400
+    response_cache.invalidate(table)
 
-    return jsonify({"message": f"id {id} in {table} approved successfully"})
+    return jsonify({"message": f"id {id} in {table} approved successfully", **result})
 
-@app.route('/admin/delete/<table>/<id>', methods=['DELETE'])
+@app.route('/admin/delete/<table>/<int:id>', methods=['DELETE'])
 def delete(table, id):
     """
     The function handles the deletion of a database entry via a DELETE request.
-    This function connects to an SQLite database, deletes an entry based on the specified table name and entry ID,
-    and then commits the change.
+    It deletes an entry based on the specified table name and entry ID, it is the one-id form of delete_batch.
     It is designed to be called using a DELETE HTTP method, which is typical for RESTful APIs.
     """
-    # Connect to the SQLite database
-    conn = sqlite3.connect('4danimals.db')
-    c = conn.cursor()
-
-    # Delete the entry with the specified ID from the table
-    c.execute(f'DELETE FROM {table} WHERE id = {id}')
-    conn.commit()
-    conn.close()
-
-    return jsonify({"message": f"id {id} in {table} deleted successfully"})
+    try:
+        result = admin_batch.delete(table, [id])
+    except admin_batch.BatchError as error:
+        return jsonify({"error": str(error)}), 400
+    response_cache.invalidate(table)
 
+    return jsonify({"message": f"id {id} in {table} deleted successfully", **result})
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8080)
\ No newline at end of file
+    # Development server: no debug reloader (set FLASK_DEBUG=1 to get it), warmed up before it listens
+    health.warm_up(app)
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', '8080')))
\ No newline at end of file
@@ -0,0 +1,192 @@
+import atexit
+import copy
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+from prometheus_client import Counter
+
+import serializers
+
+# Structured logging: every record is one JSON line on stdout with the request id and endpoint of the request
+# that logged it. Request threads only put records on a bounded in-memory queue, a listener thread of each process
+# formats and writes them, so a slow log pipe never stalls a request (records are dropped and counted instead).
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Per-logger levels, e.g. "app.forms=DEBUG,sqlalchemy.engine=WARNING"
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+# Share of requests whose debug records are kept: LOG_DEBUG_SAMPLE_RATES per endpoint
+# ("add_animal=0.01,view_animals=0.1"), LOG_DEBUG_SAMPLE_RATE for the others. A request keeps all or none of them.
+DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '1'))
+DEBUG_SAMPLE_RATES = os.environ.get('LOG_DEBUG_SAMPLE_RATES', '')
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Request ids accepted from the caller (e.g. the ingress), anything else gets a fresh one
+_REQUEST_ID = re.compile(r'[A-Za-z0-9._:-]{1,64}')
+
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total',
+    'Log records dropped because the log queue was full'
+)
+
+# Attributes every LogRecord has, the others were passed with extra={...} and are logged as fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _pairs(text):
+    # "a=1,b=2" -> {'a': '1', 'b': '2'}
+    pairs = {}
+    for item in text.split(','):
+        name, _, value = item.partition('=')
+        if name.strip() and value.strip():
+            pairs[name.strip()] = value.strip()
+    return pairs
+
+
+_debug_sample_rates = dict((endpoint, float(rate)) for endpoint, rate in _pairs(DEBUG_SAMPLE_RATES).items())
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object: ts, level, logger, message, request_id / endpoint when logged during a
+    request, the extra={...} fields and the exception text.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and value is not None:
+                entry[name] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        try:
+            return serializers.dumps(entry).decode()
+        except TypeError:
+            # An extra field JSON does not know: log its text rather than losing the record
+            return serializers.dumps(dict((name, value if isinstance(value, (str, int, float, bool, list, dict))
+                                           else str(value)) for name, value in entry.items())).decode()
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Runs in the thread that logs: adds the request id and endpoint of the current request to the record, and drops
+    the debug records of requests that are not sampled (see DEBUG_SAMPLE_RATES).
+    """
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        record.request_id = g.get('request_id')
+        record.endpoint = request.endpoint
+        if record.levelno < logging.INFO:
+            sampled = g.get('_log_debug_sampled')
+            if sampled is None:
+                rate = _debug_sample_rates.get(request.endpoint, DEBUG_SAMPLE_RATE)
+                sampled = g._log_debug_sampled = random.random() < rate
+            return sampled
+        return True
+
+
+class BufferedHandler(QueueHandler):
+    """
+    QueueHandler that never blocks: a full queue drops the record (counted in log_records_dropped_total).
+    The message and the exception text are resolved here, the JSON formatting happens on the listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_handler = None
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JSONFormatter())
+    _listener = QueueListener(_handler.queue, output)
+    _listener.start()
+
+
+def _after_fork():
+    # The listener thread does not survive a fork (e.g. gunicorn workers of a preloaded master): a fresh queue
+    # and listener for the child
+    if _handler is not None:
+        _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _start_listener()
+
+
+def configure():
+    """
+    The function installs the buffered JSON logging on the root logger with LOG_LEVEL and the LOG_LEVELS of single
+    loggers, once per process.
+    """
+    global _handler
+    if _handler is not None:
+        return
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    for name, level in _pairs(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+    _handler = BufferedHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _handler.addFilter(RequestContextFilter())
+    root.addHandler(_handler)
+    _start_listener()
+    os.register_at_fork(after_in_child=_after_fork)
+    atexit.register(flush)
+
+
+def flush():
+    """
+    The function writes out every queued record and stops the listener, e.g. before the process exits.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def init_app(app):
+    """
+    The function configures the logging and gives every request an id: the caller's X-Request-ID when it is
+    a sane one, a new one otherwise. It is on every log record of the request and returned in X-Request-ID.
+    """
+    configure()
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if _REQUEST_ID.fullmatch(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def return_request_id(response):
+        if 'request_id' in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
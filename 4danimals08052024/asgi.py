@@ -0,0 +1,214 @@
+# ASGI entry point: serves the Flask app from an asyncio event loop.
+#
+#     uvicorn asgi:app --host 0.0.0.0 --port 8080
+#     hypercorn asgi:app --bind 0.0.0.0:8080
+#     gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker -b 0.0.0.0:8080 asgi:app
+#
+# The views stay the same synchronous Flask views (same hooks, metrics, caches and SQLite pool), they run on
+# bounded thread pools: one for the read paths (GET / HEAD and the POST filters of the view_* pages) and a small
+# separate one for the writes, so a burst of reads can never starve them. Reading request bodies and writing
+# responses happens on the event loop, so a slow client holds a socket, not a thread or a pooled connection.
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from prometheus_client import Gauge
+
+import db_pool
+import health
+from app import app as flask_app
+
+# Threads running read requests, by default one per pooled SQLite connection
+READ_THREADS = int(os.environ.get('ASGI_READ_THREADS', str(db_pool.POOL_SIZE)))
+# Threads running write requests, SQLite has a single writer anyway
+WRITE_THREADS = int(os.environ.get('ASGI_WRITE_THREADS', '2'))
+# Requests waiting for or running on a thread, or still streaming their body, beyond it new requests get 503 instead of queueing without bound
+MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', '512'))
+# Bytes of a response produced in the worker thread before handing it to the event loop, bigger (streamed)
+# responses continue in chunks, one thread hop per chunk
+BUFFER_SIZE = 64 * 1024
+
+ASGI_PENDING = Gauge(
+    'asgi_pending_requests',
+    'Requests waiting for or running on an ASGI worker thread, or still streaming their body',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+
+# Request paths whose POST only filters (the view pages), they are reads as well
+READ_POST_PREFIXES = ('/view-',)
+
+
+def is_read(method, path):
+    return method in ('GET', 'HEAD') or (method == 'POST' and path.startswith(READ_POST_PREFIXES))
+
+
+def wsgi_environ(scope, body):
+    """
+    The function builds the WSGI environ of an ASGI HTTP request scope with the fully read body.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            environ[name] = value
+            continue
+        key = 'HTTP_' + name
+        if key in environ:
+            # Repeated headers are one comma-separated list, except the cookies an HTTP/2 client may send
+            # as separate headers, which join with '; ' (RFC 9113, 8.2.3)
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+class ASGIApp:
+    """
+    ASGI adapter running a WSGI app on bounded read / write thread pools, see the comment at the top of the module.
+    """
+
+    def __init__(self, wsgi_app, read_threads=READ_THREADS, write_threads=WRITE_THREADS, max_pending=MAX_PENDING):
+        self.wsgi_app = wsgi_app
+        self.max_pending = max_pending
+        self.pending = 0
+        self.executors = {
+            'read': ThreadPoolExecutor(read_threads, thread_name_prefix='asgi-read'),
+            'write': ThreadPoolExecutor(write_threads, thread_name_prefix='asgi-write'),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Warm up before the server starts accepting connections
+                await asyncio.get_running_loop().run_in_executor(self.executors['write'], health.warm_up, flask_app)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for executor in self.executors.values():
+                    executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        if self.pending >= self.max_pending:
+            await send({'type': 'http.response.start', 'status': 503,
+                        'headers': [(b'content-type', b'text/plain'), (b'retry-after', b'1')]})
+            await send({'type': 'http.response.body', 'body': b'Server busy'})
+            return
+
+        pool = 'read' if is_read(scope['method'], scope['path']) else 'write'
+        executor = self.executors[pool]
+        loop = asyncio.get_running_loop()
+        # Counted as pending until the body has been sent in full or closed, a streamed one keeps its pool busy
+        self.pending += 1
+        ASGI_PENDING.labels(pool=pool).inc()
+        iterator = None
+        try:
+            status, headers, chunks, iterator = await loop.run_in_executor(
+                executor, self.start, wsgi_environ(scope, bytes(body)))
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': iterator is not None})
+            # A streamed response: pull the next chunks on the pool, one hop per buffer, until the end or a disconnect
+            disconnected = asyncio.ensure_future(receive())
+            while iterator is not None and not disconnected.done():
+                chunks, done = await loop.run_in_executor(executor, self.pull, iterator)
+                await send({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': not done})
+                if done:
+                    break
+            disconnected.cancel()
+        finally:
+            try:
+                if iterator is not None and hasattr(iterator, 'close'):
+                    await loop.run_in_executor(executor, iterator.close)
+            finally:
+                self.pending -= 1
+                ASGI_PENDING.labels(pool=pool).dec()
+
+    def start(self, environ):
+        """
+        Runs on a worker thread: calls the WSGI app and returns (status, headers, first chunks, iterator or None).
+        The iterator is None when the whole body fitted in the first buffer.
+        """
+        response = []
+
+        def start_response(status, headers, exc_info=None):
+            response[:] = [int(status.split(' ', 1)[0]),
+                           [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]]
+
+        result = self.wsgi_app(environ, start_response)
+        iterator = iter(result)
+        chunks, done = self.pull(iterator)
+        if done:
+            if hasattr(result, 'close'):
+                result.close()
+            return response[0], response[1], chunks, None
+        return response[0], response[1], chunks, _Closing(iterator, result)
+
+    @staticmethod
+    def pull(iterator):
+        # Runs on a worker thread: the next chunks of the body, up to BUFFER_SIZE bytes, and whether it ended
+        chunks, size = [], 0
+        for chunk in iterator:
+            if chunk:
+                chunks.append(chunk)
+                size += len(chunk)
+            if size >= BUFFER_SIZE:
+                return chunks, False
+        return chunks, True
+
+
+class _Closing:
+    # Iterator over a WSGI body that closes the original result, which returns e.g. the pooled connection
+    def __init__(self, iterator, result):
+        self.iterator = iterator
+        self.result = result
+
+    def __iter__(self):
+        return self.iterator
+
+    def __next__(self):
+        return next(self.iterator)
+
+    def close(self):
+        if hasattr(self.result, 'close'):
+            self.result.close()
+
+
+app = ASGIApp(flask_app)
@@ -0,0 +1,235 @@
+import csv
+import json
+import os
+import sqlite3
+
+import db_pool
+from validate_fileds import BOOLEAN_COLUMNS, SCHEMAS, TRUE_VALUES
+
+# Rows inserted per executemany transaction
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+# Most rows per batch a request can ask for with '?batch_size='
+MAX_IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_MAX_BATCH_SIZE', '10000'))
+# Row errors listed in the report, the counts stay exact beyond it
+MAX_REPORTED_ERRORS = int(os.environ.get('IMPORT_MAX_REPORTED_ERRORS', '1000'))
+
+# Columns accepted from an upload, per table. Anything else in the file is ignored, 'id' is always assigned by the DB.
+IMPORT_COLUMNS = {
+    'animal': ('name', 'gender', 'color', 'birth_date', 'age', 'species', 'breed_name', 'chip_number',
+               'spayed_neutered', 'arrival', 'foster', 'current_owner', 'vaccines'),
+    'applicants': ('full_name', 'teudat_zehut', 'address', 'city', 'mail', 'phone', 'approved', 'owner_of'),
+    'volunteers': ('full_name', 'teudat_zehut', 'address', 'city', 'mail', 'phone', 'job_function',
+                   'can_be_foster', 'animal_fostered'),
+}
+# Values a column can take from an upload, a JSON list or object is rejected
+SCALAR_TYPES = (str, int, float, bool)
+# Errors of inserting a row: anything the database rejects, and integers beyond SQLite's 64 bits
+INSERT_ERRORS = (sqlite3.Error, OverflowError)
+
+
+def import_format(request, upload):
+    """
+    The function returns 'csv' or 'ndjson' for an upload: '?format=' first, then the file name, then its content type.
+    """
+    requested = request.args.get('format')
+    if requested in ('csv', 'ndjson'):
+        return requested
+    filename = (getattr(upload, 'filename', None) or '').lower()
+    if filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if filename.endswith('.csv'):
+        return 'csv'
+    mimetype = getattr(upload, 'mimetype', None) or request.mimetype
+    return 'ndjson' if 'ndjson' in mimetype or 'jsonl' in mimetype else 'csv'
+
+
+def batch_size_arg(args):
+    """
+    The function returns the batch size asked for with '?batch_size=', IMPORT_BATCH_SIZE when there is none,
+    clamped to 1..MAX_IMPORT_BATCH_SIZE.
+    """
+    batch_size = args.get('batch_size', type=int) or IMPORT_BATCH_SIZE
+    return max(1, min(batch_size, MAX_IMPORT_BATCH_SIZE))
+
+
+class UploadError(Exception):
+    """
+    The upload cannot be read any further, e.g. invalid UTF-8 or a malformed CSV quote. 'line' is where it stopped.
+    """
+
+    def __init__(self, line, message):
+        super().__init__(message)
+        self.line = line
+
+
+class _DecodedLines:
+    """
+    Iterator over the lines of a binary upload stream decoded as UTF-8 (a leading BOM is dropped), for csv.reader.
+    'line_number' is the last line read, so errors point at the right line even inside a multi-line CSV record.
+    Raises UploadError on the first line that is not valid UTF-8.
+    """
+
+    def __init__(self, stream):
+        self.lines = iter(stream)
+        self.line_number = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raw = next(self.lines)
+        self.line_number += 1
+        try:
+            return raw.decode('utf-8-sig' if self.line_number == 1 else 'utf-8')
+        except UnicodeDecodeError as error:
+            raise UploadError(self.line_number, f'Invalid UTF-8: {error.reason}') from error
+
+
+def iter_records(stream, fmt):
+    """
+    The generator parses a binary upload stream line by line and yields (line number, record dict).
+    A line that cannot be parsed yields (line number, None) so it is reported instead of aborting the import.
+    A CSV upload that cannot be read past some line (invalid UTF-8, broken quoting) raises UploadError there.
+    """
+    if fmt == 'csv':
+        lines = _DecodedLines(stream)
+        reader = csv.DictReader(lines)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        except csv.Error as error:
+            raise UploadError(lines.line_number, f'Malformed CSV: {error}') from error
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            # json.loads() takes the raw bytes, a BOM included, and raises a ValueError on invalid UTF-8 too
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+
+
+def _normalize(record, columns):
+    """
+    The function maps a parsed record onto the table columns (case-insensitive), with empty values as None.
+    It returns the normalized record and the errors of the columns holding something else than a single value.
+    """
+    by_name = {str(key).strip().lower(): value for key, value in record.items()}
+    normalized = {}
+    errors = []
+    for column in columns:
+        value = by_name.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        elif value is not None and not isinstance(value, SCALAR_TYPES):
+            errors.append(f'{column}: expected a single value, got {type(value).__name__}')
+        normalized[column] = None if value == '' else value
+    return normalized, errors
+
+
+def _row_values(record, columns):
+    """
+    The function returns the tuple of values to insert, with boolean columns stored as 1 / 0.
+    """
+    values = []
+    for column in columns:
+        value = record[column]
+        if column in BOOLEAN_COLUMNS and value is not None and not isinstance(value, bool):
+            value = str(value).lower() in TRUE_VALUES
+        values.append(value)
+    return tuple(values)
+
+
+class ImportReport:
+    """
+    Counters and per-row errors of one bulk import, returned to the client as JSON via as_dict().
+    'aborted' holds the line and message of an UploadError that stopped the import before the end of the file.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+        self.committed_batches = 0
+        self.last_committed_line = None
+        self.aborted = None
+
+    def reject(self, line, errors):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'table': self.table,
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'errors_truncated': self.rejected > len(self.errors),
+            'committed_batches': self.committed_batches,
+            'last_committed_line': self.last_committed_line,
+            'complete': self.aborted is None,
+            'aborted': self.aborted,
+        }
+
+
+def _insert_batch(conn, sql, batch, report):
+    """
+    The function inserts a batch with one executemany in one transaction.
+    If the database rejects the batch, it is retried row by row so only the offending rows are reported.
+    """
+    try:
+        with conn:
+            conn.executemany(sql, [values for line, values in batch])
+        report.inserted += len(batch)
+    except INSERT_ERRORS:
+        for line, values in batch:
+            try:
+                with conn:
+                    conn.execute(sql, values)
+                report.inserted += 1
+            except INSERT_ERRORS as error:
+                report.reject(line, [str(error)])
+    report.committed_batches += 1
+    report.last_committed_line = batch[-1][0]
+
+
+def import_records(table, records, batch_size=IMPORT_BATCH_SIZE):
+    """
+    The function validates records with the table's validate_fileds schema and inserts the valid ones
+    in batches of batch_size. 'records' is an iterable of (line number, record dict or None), e.g. iter_records().
+    'table' must be one of IMPORT_COLUMNS. Returns the ImportReport.
+    An UploadError from 'records' stops reading: the rows read before it are still inserted and the report is
+    marked aborted at that line.
+    """
+    columns = IMPORT_COLUMNS[table]
+    schema = SCHEMAS[table]
+    sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+    report = ImportReport(table)
+    batch = []
+    with db_pool.get_pool().connection() as conn:
+        try:
+            for line, record in records:
+                if record is None:
+                    report.reject(line, ['Unreadable row'])
+                    continue
+                record, errors = _normalize(record, columns)
+                if errors:
+                    report.reject(line, errors)
+                    continue
+                valid, errors = schema.validate(record)
+                if not valid:
+                    report.reject(line, errors)
+                    continue
+                batch.append((line, _row_values(record, columns)))
+                if len(batch) >= batch_size:
+                    _insert_batch(conn, sql, batch, report)
+                    batch = []
+        except UploadError as error:
+            report.aborted = {'line': error.line, 'error': str(error)}
+        if batch:
+            _insert_batch(conn, sql, batch, report)
+    return report
@@ -0,0 +1,150 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Responses smaller than this are sent as they are, compressing them would not pay off
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', '6'))
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'application/javascript',
+    'application/json', 'application/x-ndjson', 'image/svg+xml',
+}
+# Static files worth keeping precompressed copies (.gz / .br) of next to them
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+
+# Cache lifetime of static files requested with a content hash ('?v='), they never change under the same URL
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+# ETag suffix per encoding: a compressed body is a different representation, so it gets a different strong ETag
+ETAG_SUFFIXES = {'br': '-br', 'gzip': '-gz'}
+
+_static_hashes = {}
+
+
+def choose_encoding(accept_encodings):
+    """
+    The function returns the best content encoding the client accepts ('br', 'gzip') or None.
+    """
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(COMPRESS_LEVEL, 11))
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+def compress_response(response):
+    """
+    after_request hook compressing text responses above COMPRESS_MIN_SIZE for clients that accept it.
+    Streamed and file responses are left alone, static files have precompressed copies instead.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.content_length or 0) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + ETAG_SUFFIXES[encoding], weak)
+    return response
+
+
+def etag_variants(etag):
+    """
+    The function returns the ETag of every representation of a response: plain and each compressed encoding.
+    """
+    return [etag] + [etag + suffix for suffix in ETAG_SUFFIXES.values()]
+
+
+def static_hash(static_folder, filename):
+    """
+    The function returns a short content hash of a static file, computed once per process.
+    """
+    path = os.path.join(static_folder, filename)
+    key = (path, os.path.getmtime(path))
+    if key not in _static_hashes:
+        with open(path, 'rb') as f:
+            _static_hashes[key] = hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+    return _static_hashes[key]
+
+
+def init_app(app):
+    """
+    The function installs response compression, precompressed static files and content-hashed static URLs:
+    url_for('static', filename=...) gets a '?v=<hash>' and such URLs are served with a one year immutable
+    Cache-Control, so browsers and proxies only fetch an asset again when its content changes.
+    Call it after the app's own after_request hooks so they see the final, compressed response.
+    """
+    app.after_request(compress_response)
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            try:
+                values['v'] = static_hash(app.static_folder, values['filename'])
+            except OSError:
+                pass
+
+    def static(filename):
+        encoding = choose_encoding(request.accept_encodings)
+        suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding)
+        precompressed = safe_join(app.static_folder, filename + suffix) if suffix else None
+        if precompressed and filename.endswith(PRECOMPRESS_EXTENSIONS) and os.path.isfile(precompressed):
+            response = send_from_directory(app.static_folder, filename + suffix)
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response = app.send_static_file(filename)
+        response.vary.add('Accept-Encoding')
+        if request.args.get('v'):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = static
+
+
+def precompress_static(static_folder):
+    """
+    The function writes .gz (and, with brotli installed, .br) copies of the text files in the static folder.
+    Run it at image build time: 'python3 compression.py'.
+    """
+    for root, dirs, files in os.walk(static_folder):
+        for name in files:
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+                if encoding == 'br' and brotli is None:
+                    continue
+                with open(path + suffix, 'wb') as f:
+                    f.write(compress(data, encoding))
+
+
+if __name__ == '__main__':
+    precompress_static(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import sqlite3
+from functools import wraps
+
+from flask import Response, current_app, g, request
+
+import compression
+import db_pool
+
+
+def _build_id():
+    """
+    The function fingerprints the deployed code and templates, so a deploy that changes how pages render
+    also changes every ETag. Workers of the same image agree on it.
+    """
+    digest = hashlib.blake2b(digest_size=4)
+    basedir = os.path.dirname(os.path.abspath(__file__))
+    for folder in (basedir, os.path.join(basedir, 'templates')):
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(('.py', '.html')):
+                stat = os.stat(os.path.join(folder, name))
+                digest.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()
+
+
+BUILD_ID = os.environ.get('APP_BUILD') or _build_id()
+
+
+def table_versions(tables):
+    """
+    The function returns the change counters of the given tables (maintained by the triggers of migration 3),
+    or None if they are not available (e.g. migrations not applied yet).
+    """
+    placeholders = ', '.join('?' * len(tables))
+    try:
+        with db_pool.get_pool().connection() as conn:
+            rows = conn.execute(f'SELECT table_name, version FROM table_versions WHERE table_name IN ({placeholders})',
+                                tables).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    versions = dict((row[0], row[1]) for row in rows)
+    if len(versions) != len(tables):
+        return None
+    return tuple(versions[table] for table in tables)
+
+
+def current_versions(tables):
+    """
+    The function returns the versions of the given tables for the current request: the ones etagged already read
+    (and built the ETag from) when it wraps the view, otherwise a fresh lookup.
+    """
+    known = g.get('_table_versions')
+    if known is not None and known[0] == tables:
+        return known[1]
+    return table_versions(tables)
+
+
+def make_etag(tables, versions):
+    """
+    The function builds the strong ETag of the current request: the table versions plus a digest of the build,
+    the endpoint, its URL arguments, the query string and the Accept header (the format can be negotiated).
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f'{BUILD_ID}|{request.endpoint}|{sorted(request.view_args.items())}|'.encode())
+    digest.update(request.query_string)
+    digest.update(request.headers.get('Accept', '').encode())
+    return '-'.join(f'{table}.{version}' for table, version in zip(tables, versions)) + '-' + digest.hexdigest()
+
+
+def etagged(*tables):
+    """
+    Decorator for a GET view whose output depends only on the given tables and the URL.
+    It answers If-None-Match with 304 Not Modified, after one lookup of the table versions and before the view runs,
+    and sets the ETag on full responses. Other methods are passed through.
+    Use '*' as a table to mean "the table named by the 'table' URL argument".
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            depends_on = tuple(kwargs.get('table', '').lower() if table == '*' else table for table in tables)
+            versions = table_versions(depends_on)
+            if versions is None:
+                return view(*args, **kwargs)
+            # The response cache under this decorator serves the body rendered from these same versions
+            g._table_versions = (depends_on, versions)
+            etag = make_etag(depends_on, versions)
+            # The client may hold the compressed representation, whose ETag carries an encoding suffix
+            for variant in compression.etag_variants(etag):
+                if request.if_none_match.contains(variant):
+                    response = Response(status=304)
+                    response.set_etag(variant)
+                    return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                # Let clients keep the copy but revalidate it on every use
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
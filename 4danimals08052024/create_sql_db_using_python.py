@@ -1,8 +1,8 @@
-import sqlite3
+from db_pool import connect
 
 def create_database():
-    # Connect to the database (or create it if it doesn't exist)
-    conn = sqlite3.connect('4danimals.db')
+    # Connect to the database (or create it if it doesn't exist), with the same path and tuning profile as the app
+    conn = connect()
     c = conn.cursor()
 
     # Create the Animal table
@@ -0,0 +1,348 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import partial
+from time import perf_counter, time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Get the base directory of the application, the database lives next to it unless DB_PATH says otherwise
+basedir = os.path.abspath(os.path.dirname(__file__))
+DB_PATH = os.environ.get('DB_PATH', os.path.join(basedir, '4danimals.db'))
+
+# Pool sizing, shared by the raw sqlite3 pool and the SQLAlchemy engine pool
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+
+# The single tuning profile applied to every connection we open, whichever path it is used by
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', int(os.environ.get('DB_MMAP_SIZE', str(256 * 1024 * 1024)))),
+    ('cache_size', -int(os.environ.get('DB_CACHE_KB', str(64 * 1024)))),  # negative value means KiB
+    ('busy_timeout', int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))),
+)
+
+POOL_CHECKOUTS = Counter(
+    'db_pool_checkouts_total',
+    'Total connections checked out of the pool',
+    ['pool']
+)
+POOL_WAIT = Histogram(
+    'db_pool_wait_seconds',
+    'Time spent waiting for a free pooled connection',
+    ['pool'],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+POOL_IN_USE = Gauge(
+    'db_pool_connections_in_use',
+    'Connections currently checked out of the pool',
+    ['pool'],
+    multiprocess_mode='livesum'
+)
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no pooled connection became free within the pool timeout.
+    """
+
+
+class QueryRecord:
+    """
+    One executed SQL statement as seen by the query listeners.
+    'rowcount' is what the cursor reports after execute (affected rows for writes, -1 for SELECT).
+    'rows' and 'duration' keep growing while the rows of a SELECT are fetched, so a listener that holds on to the
+    record until the end of the request sees the complete figures.
+    """
+    __slots__ = ('statement', 'parameters', 'duration', 'rowcount', 'rows')
+
+    def __init__(self, statement, parameters, duration, rowcount):
+        self.statement = statement
+        self.parameters = parameters
+        self.duration = duration
+        self.rowcount = rowcount
+        self.rows = 0
+
+
+# Callables notified after every statement: listener(record), record being a QueryRecord
+_query_listeners = []
+
+
+def add_query_listener(listener):
+    """
+    The function registers a listener that is called after every statement run through a pooled connection
+    or an instrumented SQLAlchemy engine.
+    """
+    _query_listeners.append(listener)
+
+
+def _notify(record):
+    for listener in _query_listeners:
+        listener(record)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    A sqlite3 cursor that times execute / executemany and reports them to the query listeners,
+    then adds the rows it returns and the time spent fetching them to the statement's QueryRecord.
+    On SQLAlchemy connections the record is created by the engine events instead (see instrument_engine).
+    """
+    record = None
+
+    def _executed(self, sql, parameters, start):
+        if self.connection.report_statements:
+            self.record = QueryRecord(sql, parameters, perf_counter() - start, self.rowcount)
+            _notify(self.record)
+
+    def _fetched(self, rows, start):
+        if self.record is not None:
+            self.record.rows += rows
+            self.record.duration += perf_counter() - start
+
+    def execute(self, sql, parameters=()):
+        self.record = None
+        start = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._executed(sql, parameters, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.record = None
+        start = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._executed(sql, None, start)
+
+    def fetchone(self):
+        start = perf_counter()
+        row = super().fetchone()
+        self._fetched(row is not None, start)
+        return row
+
+    def fetchmany(self, size=None):
+        start = perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), start)
+        return rows
+
+    def fetchall(self):
+        start = perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), start)
+        return rows
+
+    def __next__(self):
+        start = perf_counter()
+        row = super().__next__()
+        self._fetched(1, start)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    A sqlite3 connection whose cursors, including the implicit ones of conn.execute(), are InstrumentedCursors.
+    """
+    report_statements = True
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class EngineConnection(InstrumentedConnection):
+    """
+    The connection class of the SQLAlchemy engine: its statements are reported by the engine events,
+    the cursors only count the fetched rows.
+    """
+    report_statements = False
+
+
+def apply_pragmas(conn):
+    """
+    The function applies the shared tuning profile (PRAGMAS) to a freshly opened sqlite3 connection.
+    The plain sqlite3 execute() skips the InstrumentedCursor, so the query listeners (and the request that happened
+    to open the connection) are not charged for the setup.
+    """
+    for name, value in PRAGMAS:
+        sqlite3.Connection.execute(conn, f'PRAGMA {name}={value}')
+
+
+def connect(factory=sqlite3.Connection):
+    """
+    The function opens a new sqlite3 connection to DB_PATH with the shared tuning profile applied.
+    It is used both by the raw connection pool (with an InstrumentedConnection factory) and, as the engine 'creator',
+    by Flask-SQLAlchemy (with an EngineConnection factory).
+    """
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=factory)
+    apply_pragmas(conn)
+    return conn
+
+
+class ConnectionPool:
+    """
+    A bounded pool of sqlite3 connections for one worker process.
+    At most 'size' connections are checked out at once, callers beyond that wait up to 'timeout' seconds.
+    Idle connections are reused most-recently-used first so the hot ones keep a warm page cache.
+    """
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT, name='raw'):
+        self.size = size
+        self.timeout = timeout
+        self.name = name
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.in_use = 0
+
+    def acquire(self):
+        """
+        The function checks a connection out of the pool, opening a new one if no idle connection is available.
+        Rows fetched through pooled connections are sqlite3.Row objects, so templates can use 'row.column'.
+        """
+        start = time()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No free connection in the '{self.name}' pool after {self.timeout} seconds")
+        waited = time() - start
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = connect(InstrumentedConnection)
+            except Exception:
+                self._slots.release()
+                raise
+            conn.row_factory = sqlite3.Row
+
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time += waited
+            self.in_use += 1
+        POOL_CHECKOUTS.labels(pool=self.name).inc()
+        POOL_WAIT.labels(pool=self.name).observe(waited)
+        POOL_IN_USE.labels(pool=self.name).inc()
+        return conn
+
+    def release(self, conn):
+        """
+        The function returns a connection to the pool. Any transaction left open is rolled back first,
+        and a connection that cannot be rolled back is closed instead of being reused.
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            POOL_IN_USE.labels(pool=self.name).dec()
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager form of acquire/release: 'with pool.connection() as conn: ...'.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """
+        The function closes every idle connection, e.g. on shutdown or after a fork.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def stats(self):
+        """
+        The function returns a snapshot of the pool counters, for sizing workers against the pool.
+        """
+        with self._lock:
+            return {
+                'size': self.size,
+                'checkouts': self.checkouts,
+                'wait_time': self.wait_time,
+                'in_use': self.in_use,
+                'idle': self._idle.qsize(),
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    The function returns the connection pool of the current process.
+    sqlite3 connections must not cross a fork, so a worker forked from a preloaded master gets a pool of its own.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool()
+                _pool_pid = pid
+    return _pool
+
+
+def engine_options():
+    """
+    The function returns the SQLALCHEMY_ENGINE_OPTIONS that make the Flask-SQLAlchemy engine open its connections
+    through connect() (same file, same tuning profile) and bound its pool with the same size and timeout.
+    """
+    return {
+        'creator': partial(connect, EngineConnection),
+        'pool_size': POOL_SIZE,
+        'max_overflow': 0,
+        'pool_timeout': POOL_TIMEOUT,
+    }
+
+
+def instrument_engine(engine):
+    """
+    The function reports checkouts and in-use connections of a SQLAlchemy engine's pool
+    under the same metrics as the raw pool, with pool="sqlalchemy", and reports its statements to the query listeners.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_conn, conn_record, conn_proxy):
+        POOL_CHECKOUTS.labels(pool='sqlalchemy').inc()
+        POOL_IN_USE.labels(pool='sqlalchemy').inc()
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_conn, conn_record):
+        POOL_IN_USE.labels(pool='sqlalchemy').dec()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = perf_counter() - conn.info['query_start'].pop()
+        record = QueryRecord(statement, parameters, duration, cursor.rowcount)
+        # The DBAPI cursor is an InstrumentedCursor, let it add the fetched rows to this record
+        cursor.record = record
+        _notify(record)
@@ -0,0 +1,360 @@
+# Synthetic data generator for benchmarking and tuning, e.g.
+#
+#     python3 generate_data.py --animals 1000000 --applicants 500000 --volunteers 200000
+#     DB_PATH=/tmp/bench.db python3 generate_data.py --animals 50000 --seed 7
+#
+# It creates the schema and applies the migrations if needed, then appends rows to Animal, Applicants, Volunteers,
+# Vaccines and Foster_application_form. Every row passes the validate_fileds rules (checksum-valid Israeli IDs,
+# 15 digit chip numbers starting with 9, valid phone numbers, ...) and the same seed gives the same rows.
+# Each table is loaded in one transaction with its indexes and triggers dropped and rebuilt once at the end.
+#
+# Binding the values of a row from Python costs more than SQLite needs to store it, so the rows are not inserted one
+# by one: a pool of rows is generated (and validated) in Python, and one INSERT ... SELECT builds the table from it,
+# row index by row index, recomputing the columns that must be unique per row (IDs, chip numbers, e-mails) in SQL.
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from create_sql_db_using_python import create_database
+from db_pool import connect
+from migrations import migrate
+from validate_fileds import SCHEMAS
+
+# Rows generated in Python per table, the loaded rows are drawn from them
+POOL_SIZE = 8192
+# Rows at the start of each table's pool checked with validate_fileds, an invalid one rolls the load back
+CHECKED_ROWS = 1000
+# Odd multiplier scattering the row indexes over the pool (and the owners), so neighbouring rows differ
+_SCATTER = 2654435761
+
+FIRST_NAMES = ('Noa', 'Yael', 'Tamar', 'Maya', 'Shira', 'Dana', 'Michal', 'Ella', 'Avigail', 'Roni',
+               'Yosef', 'David', 'Ariel', 'Daniel', 'Itai', 'Omer', 'Eitan', 'Noam', 'Amit', 'Yonatan')
+LAST_NAMES = ('Cohen', 'Levi', 'Mizrahi', 'Peretz', 'Biton', 'Dahan', 'Avraham', 'Friedman', 'Azulay', 'Katz',
+              'Yosef', 'Amar', 'Ohana', 'Hadad', 'Gabay', 'Ben David', 'Shapiro', 'Malka', 'Golan', 'Segal')
+ANIMAL_NAMES = ('Bella', 'Luna', 'Max', 'Charlie', 'Lucy', 'Rocky', 'Simba', 'Milo', 'Nala', 'Shoko', 'Lola',
+                'Oscar', 'Toby', 'Mitzi', 'Chloe', 'Buddy', 'Kitty', 'Pluto', 'Ginger', 'Snowy')
+COLORS = ('Black', 'White', 'Brown', 'Light brown', 'Gray', 'Ginger', 'Black and white', 'Cream', 'Tabby')
+BREEDS = {
+    'Dog': ('Labrador', 'German Shepherd', 'Canaan', 'Poodle', 'Beagle', 'Husky', 'Mixed'),
+    'Cat': ('Persian', 'Siamese', 'Maine Coon', 'Sphynx', 'Mixed'),
+    'Bird': ('Parrot', 'Canary', 'Cockatiel'),
+    'Fish': ('Goldfish', 'Betta'),
+    'Other': ('Rabbit', 'Hamster', 'Guinea Pig'),
+}
+CITIES = ('Haifa', 'Tel Aviv', 'Jerusalem', 'Beer Sheva', 'Eilat', 'Netanya', 'Ashdod', 'Rishon LeZion',
+          'Petah Tikva', 'Holon', 'Herzliya', 'Kfar Saba')
+STREETS = ('Herzl', 'Ben Gurion', 'Rothschild', 'Jabotinsky', 'Weizmann', 'HaNasi', 'Allenby', 'Dizengoff',
+           'Bialik', 'HaGefen')
+JOBS = ('Dog walker', 'Driver', 'Cleaning', 'Feeding', 'Adoption days', 'Social media', 'Vet assistant')
+VACCINES = ('Rabies', 'Parvo', 'Distemper', 'Hepatitis', 'Leptospirosis', 'Feline leukemia', 'Calicivirus')
+EXPERIENCE = ('Fostered puppies before', 'Grew up with dogs', 'Volunteered at a shelter', 'First time fostering')
+
+# Digit sum of a 4 digit block weighted 1, 2, 1, 2 the way is_valid_israeli_id does it (products above 9 add their
+# digits). Both halves of the 8 digit body start on weight 1, so one table serves both.
+_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+_BLOCK_SUMS = [(n // 1000) + _DOUBLED[n // 100 % 10] + (n // 10 % 10) + _DOUBLED[n % 10] for n in range(10000)]
+
+
+def israeli_id(body):
+    """
+    The function returns the 9 digit Israeli ID with the 8 digit body 'body' (0 - 99999999) and
+    the check digit is_valid_israeli_id expects.
+    """
+    check = (_BLOCK_SUMS[body // 10000] + _BLOCK_SUMS[body % 10000]) % 10
+    return f'{body:08d}{check}'
+
+
+def _spread(index, modulus, multiplier, offset):
+    # A bijection of 0 .. modulus-1 (multiplier is coprime with the power of ten modulus): distinct indexes
+    # give distinct, scattered values, so row numbers map to unique IDs and chip numbers without bookkeeping
+    return (index * multiplier + offset) % modulus
+
+
+def person_id(table, index):
+    # Unique within a table, the row index of a person is enough to find its ID again (e.g. for current_owner)
+    return israeli_id(_spread(index, 10 ** 8, 48271813, 1000003 if table == 'applicants' else 2000029))
+
+
+def chip_number(index):
+    return 9 * 10 ** 14 + _spread(index, 10 ** 14, 7919000003, 13)
+
+
+def _dates(first, last):
+    # Every 'YYYY-MM-DD' from first to last without 29 February, so a date moved by whole years stays valid
+    days = (last - first).days
+    return [str(day) for day in (first + timedelta(n) for n in range(days + 1)) if (day.month, day.day) != (2, 29)]
+
+
+_ARRIVALS = _dates(date(2019, 1, 1), date(2024, 5, 8))
+_FULL_NAMES = [(f'{first} {last}', f'{first}.{last}'.lower().replace(' ', '')) for first in FIRST_NAMES
+               for last in LAST_NAMES]
+_ADDRESSES = [f'{street} {number}' for street in STREETS for number in range(1, 121)]
+_SPECIES_BREEDS = [(species, breed) for species, breeds in BREEDS.items() for breed in breeds]
+_VACCINE_LISTS = [None] + [', '.join(VACCINES[start:start + size]) for size in (1, 2, 3)
+                           for start in range(len(VACCINES) - size + 1)]
+
+
+def _phone(rng):
+    # 05X + 7 digits, the first of them not 0 (see the 'phone' rule)
+    return f'05{rng.randrange(10)}{rng.randrange(1000000, 10000000)}'
+
+
+def animal_rows(rng, start, count, owners):
+    """
+    The function returns 'count' Animal rows for row indexes start .. start+count-1.
+    'owners' is the range of applicant indexes whose IDs can appear as current_owner, or None.
+    """
+    random = rng.random
+    rows = []
+    for index in range(start, start + count):
+        arrival = _ARRIVALS[int(random() * len(_ARRIVALS))]
+        age = int(random() * 15) + 1
+        species, breed = _SPECIES_BREEDS[int(random() * len(_SPECIES_BREEDS))]
+        rows.append((
+            ANIMAL_NAMES[int(random() * len(ANIMAL_NAMES))],
+            'Male' if random() < 0.5 else 'Female',
+            COLORS[int(random() * len(COLORS))],
+            f'{int(arrival[:4]) - age}{arrival[4:]}',
+            age,
+            species,
+            breed,
+            chip_number(index) if random() < 0.7 else None,
+            random() < 0.6,
+            arrival,
+            random() < 0.2,
+            int(person_id('applicants', owners[int(random() * len(owners))])) if owners and random() < 0.3 else None,
+            _VACCINE_LISTS[int(random() * len(_VACCINE_LISTS))],
+        ))
+    return rows
+
+
+def applicant_rows(rng, start, count, owners=None):
+    random = rng.random
+    rows = []
+    for index in range(start, start + count):
+        full_name, mail = _FULL_NAMES[int(random() * len(_FULL_NAMES))]
+        rows.append((
+            full_name,
+            person_id('applicants', index),
+            _ADDRESSES[int(random() * len(_ADDRESSES))],
+            CITIES[int(random() * len(CITIES))],
+            f'{mail}{index}@example.com',
+            _phone(rng),
+            random() < 0.3,
+            'Cat' if random() < 0.4 else 'Dog',
+        ))
+    return rows
+
+
+def volunteer_rows(rng, start, count, owners=None):
+    random = rng.random
+    rows = []
+    for index in range(start, start + count):
+        full_name, mail = _FULL_NAMES[int(random() * len(_FULL_NAMES))]
+        rows.append((
+            full_name,
+            person_id('volunteers', index),
+            _ADDRESSES[int(random() * len(_ADDRESSES))],
+            CITIES[int(random() * len(CITIES))],
+            f'{mail}{index}@example.com',
+            _phone(rng),
+            JOBS[int(random() * len(JOBS))],
+            random() < 0.3,
+            ANIMAL_NAMES[int(random() * len(ANIMAL_NAMES))] if random() < 0.2 else None,
+        ))
+    return rows
+
+
+def vaccine_rows(rng, start, count, owners=None):
+    random = rng.random
+    return [(VACCINES[int(random() * len(VACCINES))], _ARRIVALS[int(random() * len(_ARRIVALS))])
+            for index in range(count)]
+
+
+def foster_rows(rng, start, count, owners=None):
+    random = rng.random
+    rows = []
+    for index in range(start, start + count):
+        full_name, mail = _FULL_NAMES[int(random() * len(_FULL_NAMES))]
+        other_pets = random() < 0.4
+        rows.append((full_name, _phone(rng), _ADDRESSES[int(random() * len(_ADDRESSES))],
+                     f'{mail}{index}@example.com')
+                    # foster_dog .. previous_experience
+                    + tuple(random() < 0.4 for flag in range(8))
+                    + (EXPERIENCE[int(random() * len(EXPERIENCE))], other_pets, 'Two cats' if other_pets else None))
+    return rows
+
+
+# Table -> (inserted columns, row generator), in load order: applicants first, animals reference them as owners
+TABLES = {
+    'Applicants': (('full_name', 'teudat_zehut', 'address', 'city', 'mail', 'phone', 'approved', 'owner_of'),
+                   applicant_rows),
+    'Animal': (('name', 'gender', 'color', 'birth_date', 'age', 'species', 'breed_name', 'chip_number',
+                'spayed_neutered', 'arrival', 'foster', 'current_owner', 'Vaccines'), animal_rows),
+    'Volunteers': (('full_name', 'teudat_zehut', 'address', 'city', 'mail', 'phone', 'job_function',
+                    'can_be_foster', 'animal_fostered'), volunteer_rows),
+    'Vaccines': (('Vaccine_name', 'Vaccine_date'), vaccine_rows),
+    'Foster_application_form': (('full_name', 'phone_number', 'address', 'email', 'foster_dog', 'foster_cat',
+                                 'foster_pups', 'foster_kittens', 'foster_dog_with_newborns', 'foster_newborn_kittens',
+                                 'has_car', 'previous_experience', 'detailed_experience', 'other_pets_at_home',
+                                 'detailed_pets_at_home'), foster_rows),
+}
+
+
+# Table -> {column: SQL expression} of the columns recomputed for every loaded row, 'i' being its row index and 'p'
+# the pool row it is drawn from. The others are copied from the pool row.
+UNIQUE_COLUMNS = {
+    'Applicants': {
+        'teudat_zehut': "person_id('applicants', i)",
+        'mail': "rtrim(substr(p.mail, 1, instr(p.mail, '@') - 1), '0123456789') || i || '@example.com'",
+    },
+    'Animal': {
+        'chip_number': 'CASE WHEN p.chip_number IS NOT NULL THEN chip_number(i) END',
+        'current_owner': "CASE WHEN p.current_owner IS NOT NULL THEN CAST(person_id('applicants', "
+                         f":owners_start + i * {_SCATTER} % :owners_count) AS INTEGER) END",
+    },
+    'Volunteers': {
+        'teudat_zehut': "person_id('volunteers', i)",
+        'mail': "rtrim(substr(p.mail, 1, instr(p.mail, '@') - 1), '0123456789') || i || '@example.com'",
+    },
+    'Foster_application_form': {
+        'email': "rtrim(substr(p.email, 1, instr(p.email, '@') - 1), '0123456789') || i || '@example.com'",
+    },
+}
+
+
+def check_rows(table, columns, rows):
+    """
+    The function validates rows with the table's validate_fileds schema (tables without one pass)
+    and raises ValueError on the first invalid row.
+    """
+    schema = SCHEMAS.get(table.lower())
+    if schema is None:
+        return
+    names = [column.lower() for column in columns]
+    for row in rows:
+        valid, errors = schema.validate(dict(zip(names, row)))
+        if not valid:
+            raise ValueError(f'Generated {table} row {row} is invalid: {", ".join(errors)}')
+
+
+def _defer(conn, table, kinds):
+    """
+    The function drops the schema objects of the given kinds ('index', 'trigger') of a table
+    and returns the statements that recreate them.
+    """
+    rows = conn.execute(f"SELECT type, name, sql FROM sqlite_master WHERE type IN ({', '.join('?' * len(kinds))}) "
+                        "AND tbl_name = ? COLLATE NOCASE AND sql IS NOT NULL", (*kinds, table)).fetchall()
+    for kind, name, sql in rows:
+        conn.execute(f'DROP {kind.upper()} {name}')
+    return [sql for kind, name, sql in rows]
+
+
+def load_table(conn, table, count, rng, owners=None, pool_size=POOL_SIZE):
+    """
+    The function appends 'count' generated rows to a table in one transaction and returns the range of row indexes
+    it generated and the seconds spent inserting the rows (the rest went to the pool and the indexes).
+    The table's triggers are dropped during the load and their work is done once at the end:
+    the new rows are added to the animal_fts and animal_trigram indexes and the table's ETag version is bumped.
+    Its indexes are dropped and rebuilt too, unless the table already holds more rows than the load
+    (rebuilding costs a pass over the whole table).
+    """
+    columns, generator = TABLES[table]
+    unique = UNIQUE_COLUMNS.get(table, {})
+    start = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+    pool = generator(rng, start, min(pool_size, count), owners)
+    check_rows(table, columns, pool[:CHECKED_ROWS])
+    conn.execute('DROP TABLE IF EXISTS temp.generated_pool')
+    conn.execute(f'CREATE TEMP TABLE generated_pool ({", ".join(columns)})')
+    conn.executemany(f'INSERT INTO temp.generated_pool VALUES ({", ".join("?" * len(columns))})', pool)
+    sql = (f'INSERT INTO {table} ({", ".join(columns)}) '
+           f'WITH RECURSIVE n(i) AS (SELECT :first UNION ALL SELECT i + 1 FROM n WHERE i < :last) '
+           f'SELECT {", ".join(unique.get(column, f"p.{column}") for column in columns)} '
+           f'FROM n JOIN temp.generated_pool p ON p.rowid = i * {_SCATTER} % :pool_size + 1')
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        recreate = _defer(conn, table, ('trigger', 'index') if count >= start else ('trigger',))
+        started = time.perf_counter()
+        conn.execute(sql, {'first': start, 'last': start + count - 1, 'pool_size': len(pool),
+                           'owners_start': owners.start if owners else 0, 'owners_count': len(owners) if owners else 1})
+        inserting = time.perf_counter() - started
+        for statement in recreate:
+            conn.execute(statement)
+        if table == 'Animal' and conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'animal_fts'").fetchone():
+            # What animal_fts_insert would have done, for the new rows only
+            conn.execute('INSERT INTO animal_fts (rowid, name, species, breed_name, color, Vaccines) '
+                         'SELECT id, name, species, breed_name, color, Vaccines FROM Animal WHERE id > ?', (start,))
+        if table == 'Animal' and conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'animal_trigram'").fetchone():
+            # And what animal_trigram_insert would have done
+            conn.execute('INSERT INTO animal_trigram (rowid, species, breed_name) '
+                         'SELECT id, species, breed_name FROM Animal WHERE id > ?', (start,))
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'table_versions'").fetchone():
+            conn.execute('UPDATE table_versions SET version = version + 1 WHERE table_name = ?', (table.lower(),))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.execute('DROP TABLE IF EXISTS temp.generated_pool')
+    return range(start, start + count), inserting
+
+
+def generate(counts, seed=0, pool_size=POOL_SIZE, report=print):
+    """
+    The function creates the schema if needed and loads counts[table] generated rows into each table of TABLES.
+    """
+    create_database()
+    migrate()
+    rng = random.Random(seed)
+    conn = connect()
+    conn.isolation_level = None
+    # The columns recomputed per row in SQL (UNIQUE_COLUMNS), with the same Python functions as the pool rows
+    conn.create_function('person_id', 2, person_id, deterministic=True)
+    conn.create_function('chip_number', 1, chip_number, deterministic=True)
+    # synchronous = OFF skips every fsync, but an OS crash or power loss during the load can then corrupt the whole
+    # database file, rows from before the load included. Only a database without rows yet gets it, appending to
+    # existing data keeps NORMAL (in WAL mode a crash loses at most the table being loaded).
+    empty = not any(conn.execute(f'SELECT 1 FROM {table} LIMIT 1').fetchone() for table in TABLES)
+    conn.execute(f"PRAGMA synchronous = {'OFF' if empty else 'NORMAL'}")
+    conn.execute('PRAGMA temp_store = MEMORY')
+    # Helper threads for the sorts of the index rebuilds
+    conn.execute(f'PRAGMA threads = {min(4, os.cpu_count() or 1)}')
+    owners = None
+    try:
+        for table in TABLES:
+            count = counts.get(table, 0)
+            if count <= 0:
+                continue
+            started = time.perf_counter()
+            indexes, inserting = load_table(conn, table, count, rng, owners, pool_size)
+            if table == 'Applicants':
+                owners = indexes
+            elapsed = time.perf_counter() - started
+            report(f'{table}: {count} rows in {elapsed:.2f} s ({count / elapsed:,.0f} rows/s), '
+                   f'inserted at {count / inserting:,.0f} rows/s, pool and indexes {elapsed - inserting:.2f} s')
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Append synthetic, validate_fileds-valid rows to the database '
+                                                 '(DB_PATH).')
+    parser.add_argument('--animals', type=int, default=100000)
+    parser.add_argument('--applicants', type=int, default=50000)
+    parser.add_argument('--volunteers', type=int, default=20000)
+    parser.add_argument('--vaccines', type=int, default=20000)
+    parser.add_argument('--foster', type=int, default=10000, help='Foster_application_form rows')
+    parser.add_argument('--seed', type=int, default=0, help='the same seed generates the same rows')
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE, help='rows generated in Python per table')
+    args = parser.parse_args(argv)
+    generate({'Animal': args.animals, 'Applicants': args.applicants, 'Volunteers': args.volunteers,
+              'Vaccines': args.vaccines, 'Foster_application_form': args.foster}, args.seed, args.pool_size)
+
+
+if __name__ == '__main__':
+    main()
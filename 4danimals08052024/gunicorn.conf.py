@@ -0,0 +1,128 @@
+# Gunicorn configuration, used as: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Workers and threads follow the CPU limit of the container (cgroup quota), so the same image scales with the pod's
+# resources.limits.cpu without hand-tuning. Every setting can be overridden with its environment variable or on the
+# command line (-w, --threads, ... win over this file).
+import math
+import os
+import shutil
+import sys
+
+# prometheus_client multiprocess mode: every worker writes its metrics to files in this directory and /metrics
+# aggregates them. It must be in the environment before the app (and prometheus_client) is imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+
+def reset_metrics_dir():
+    """
+    The function empties the metrics directory once per master, when this file is first loaded: before the preloaded
+    app writes metrics, and not again when a HUP reloads the configuration under running workers.
+    Files left by a previous run would otherwise be summed into the new one.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_MASTER') == str(os.getpid()):
+        return
+    os.environ['PROMETHEUS_MULTIPROC_MASTER'] = str(os.getpid())
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+reset_metrics_dir()
+
+
+def cpu_limit():
+    """
+    The function returns the CPUs this process may use: the cgroup CPU quota (v2 cpu.max, v1 cfs_quota_us /
+    cfs_period_us) when there is one, otherwise the CPUs it is allowed to run on. May be fractional, e.g. 0.5.
+    """
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if quota > 0 and period > 0:
+                return quota / period
+        except (OSError, ValueError):
+            pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+CPUS = cpu_limit()
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8080')}")
+
+# Worker processes per CPU of the limit, at least 2 so one can restart (max_requests) while the other serves.
+# Requests are mostly CPU (templates, JSON) plus short SQLite reads, more processes than CPUs only add throttling.
+WORKERS_PER_CPU = float(os.environ.get('GUNICORN_WORKERS_PER_CPU', '2'))
+workers = int(os.environ.get('WEB_CONCURRENCY', str(max(2, math.ceil(CPUS * WORKERS_PER_CPU)))))
+
+# Threads per worker overlap the SQLite I/O of concurrent requests, never more than the pooled connections
+# (db_pool.POOL_SIZE), a thread beyond that would only wait for a connection
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', str(min(4, int(os.environ.get('DB_POOL_SIZE', '8'))))))
+
+# Import the app and warm it up (templates, caches) once in the master, workers fork from it sharing that memory.
+# Database connections are not shared across the fork, see post_fork.
+preload_app = True
+
+# Restart a worker after this many requests (plus up to 'jitter' more, so workers do not restart together),
+# which bounds the memory a worker can grow to
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', str(max_requests // 10)))
+
+# Idle keep-alive connections are held longer than the ingress / load balancer keeps its upstream connections
+# idle (60 s for nginx and most cloud load balancers), so the proxy always closes first and never sends a request
+# on a connection the worker is closing (a 502)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '75'))
+# A request running longer than this gets its worker killed and restarted
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+# Time in-flight requests get to finish on SIGTERM, below the pod's terminationGracePeriodSeconds (30 s)
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '25'))
+# Worker heartbeat files in memory, a slow overlay file system must not make the master kill healthy workers
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def on_starting(server):
+    """
+    Runs in the master before any worker starts.
+    """
+    server.log.info('Sizing for %.2f CPUs: %s workers x %s threads', CPUS, server.cfg.workers, server.cfg.threads)
+
+
+def post_fork(server, worker):
+    """
+    Runs in every new worker right after the fork: the app was loaded (preload_app) in the master, drop the
+    SQLAlchemy connections it opened without closing them, they belong to the master. The raw pool
+    (db_pool.get_pool) already starts a new one per process.
+    """
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        with app_module.app.app_context():
+            app_module.db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    """
+    Runs in every worker once the app is loaded, before it accepts connections: warm the worker up,
+    so it answers /readyz and real requests without a cold start.
+    """
+    import health
+    from app import app
+    health.warm_up(app)
+
+
+def child_exit(server, worker):
+    """
+    Runs in the master when a worker exits: drop the dead worker's live gauges (in-flight requests, pool usage).
+    """
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
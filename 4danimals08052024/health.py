@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+from time import time
+
+from flask import jsonify
+
+import compression
+import db_pool
+import migrations
+
+# Pages requested once during the warm-up, so their SQL, templates and the response cache are hot before
+# the first real request. Comma separated, empty to skip.
+WARMUP_PATHS = [path for path in os.environ.get(
+    'WARMUP_PATHS', '/,/view-animals,/view-volunteers,/view-adopters').split(',') if path]
+
+_warm_lock = threading.Lock()
+# Process that warmed up: a worker forked from a warmed master (preload_app) inherits the compiled templates
+# and filled caches, but must open database connections of its own
+_warmed_pid = None
+_warmed_once = False
+# Set once the database reached the latest migration, the schema never goes back
+_migrated = False
+
+
+def _open_connections(app):
+    # Open every connection of the pool and one of the SQLAlchemy engine, so the first requests do not pay for it
+    pool = db_pool.get_pool()
+    connections = [pool.acquire() for _ in range(pool.size)]
+    for conn in connections:
+        pool.release(conn)
+    with app.app_context():
+        with app.extensions['sqlalchemy'].engine.connect():
+            pass
+
+
+def warm_up(app):
+    """
+    The function prepares a process to take traffic, once per process (later calls return at once):
+    compiles every template, opens the connections of the pool and of the SQLAlchemy engine, hashes the static
+    files and requests the WARMUP_PATHS pages to fill the caches. A broken template fails the boot.
+    In a process forked from a warmed one only the connections are opened. Returns the seconds it took.
+    """
+    global _warmed_pid, _warmed_once
+    if _warmed_pid == os.getpid():
+        return 0.0
+    with _warm_lock:
+        if _warmed_pid == os.getpid():
+            return 0.0
+        start = time()
+        if _warmed_once:
+            _open_connections(app)
+            _warmed_pid = os.getpid()
+            return time() - start
+
+        for name in app.jinja_env.list_templates(extensions=['html']):
+            app.jinja_env.get_template(name)
+
+        _open_connections(app)
+
+        for folder, _, names in os.walk(app.static_folder):
+            for name in names:
+                if not name.endswith(('.gz', '.br')):
+                    compression.static_hash(app.static_folder,
+                                            os.path.relpath(os.path.join(folder, name), app.static_folder))
+
+        client = app.test_client()
+        for path in WARMUP_PATHS:
+            status = client.get(path).status_code
+            if status >= 400:
+                app.logger.warning('Warm-up request %s answered %s', path, status)
+
+        _warmed_pid = os.getpid()
+        _warmed_once = True
+        return time() - start
+
+
+def readiness():
+    """
+    The function checks whether this process can serve requests: the database answers and is at the latest
+    migration. Returns (ready, checks).
+    """
+    global _migrated
+    checks = {'database': False, 'migrations': _migrated, 'warmed_up': _warmed_pid == os.getpid()}
+    try:
+        # A connection of its own: a probe must not queue behind a busy pool
+        conn = db_pool.connect()
+        try:
+            checks['database'] = True
+            version = conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+        finally:
+            conn.close()
+        if not _migrated:
+            _migrated = checks['migrations'] = version >= migrations.latest_version()
+    except sqlite3.Error:
+        # No schema_migrations table yet: the database is reachable, but not migrated
+        pass
+    return checks['database'] and checks['migrations'], checks
+
+
+def init_app(app):
+    """
+    The function registers the probes of the orchestrator:
+    /healthz (liveness) answers as long as the process serves requests, without touching the database,
+    /readyz (readiness) answers 200 when readiness() passes and 503 otherwise.
+    """
+
+    @app.route('/healthz', methods=['GET'])
+    def healthz():
+        return jsonify({'status': 'ok'})
+
+    @app.route('/readyz', methods=['GET'])
+    def readyz():
+        ready, checks = readiness()
+        return jsonify({'status': 'ready' if ready else 'not ready', 'checks': checks}), 200 if ready else 503
@@ -0,0 +1,293 @@
+# Load test / benchmark harness, runs offline on one machine.
+#
+#     python3 loadtest.py                                  # gunicorn, default mix, 30 s, JSON to stdout
+#     python3 loadtest.py --concurrency 32 --duration 60 --output results.json
+#     python3 loadtest.py --server uvicorn --mix view_animals=1,table_data=1
+#     python3 loadtest.py --url http://localhost:8080      # an already running server, nothing is seeded
+#
+# It creates a temporary database (schema + migrations + a fixed-seed data set), starts the app on it, drives a
+# weighted mix of requests from concurrent keep-alive clients for a fixed time and prints throughput and
+# p50 / p95 / p99 latency per scenario as JSON. The same arguments give the same data set and request sequence
+# per client, so results of different commits are comparable.
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__))
+
+# Scenario name -> weight in the default traffic mix
+DEFAULT_MIX = {
+    'index': 1,
+    'view_animals': 4,
+    'view_animals_filter': 3,
+    'view_volunteers': 2,
+    'view_adopters': 2,
+    'add_animal': 1,
+    'table_data': 2,
+    'metrics': 1,
+}
+
+SPECIES = ('Dog', 'Cat', 'Bird', 'Fish', 'Other')
+GENDERS = ('Male', 'Female')
+
+# Chip numbers of the animals added during the run, unique across clients
+_chip_numbers = itertools.count(1)
+
+
+def index(rng):
+    return 'GET', '/', None
+
+
+def view_animals(rng):
+    return 'GET', '/view-animals', None
+
+
+def view_animals_filter(rng):
+    low = rng.randint(1, 8)
+    form = {'gender': rng.choice(GENDERS), 'age_min': low, 'age_max': low + rng.randint(1, 5)}
+    if rng.random() < 0.5:
+        form['species'] = rng.choice(SPECIES)
+    return 'POST', '/view-animals', form
+
+
+def view_volunteers(rng):
+    return 'GET', '/view-volunteers', None
+
+
+def view_adopters(rng):
+    return 'GET', '/view-adopters', None
+
+
+def add_animal(rng):
+    form = {
+        'name': 'Loadtest', 'gender': rng.choice(GENDERS), 'color': 'Black', 'birth_date': '2020-01-01',
+        'age': str(rng.randint(1, 15)), 'species': rng.choice(SPECIES), 'breed_name': '',
+        'chip_number': f'9{next(_chip_numbers):014d}', 'arrival': '2024-05-08', 'current_owner': '',
+        'vaccines': 'Rabies, Parvo',
+    }
+    return 'POST', '/add-animal', form
+
+
+def table_data(rng):
+    table = rng.choice(('animal', 'applicants', 'volunteers'))
+    return 'GET', f'/admin/get_table_data/{table}?limit=100', None
+
+
+def metrics(rng):
+    return 'GET', '/metrics', None
+
+
+SCENARIOS = {scenario.__name__: scenario for scenario in (
+    index, view_animals, view_animals_filter, view_volunteers, view_adopters, add_animal, table_data, metrics)}
+
+
+def seed_database(db_path, animals, people, seed):
+    """
+    The function creates the schema and fills a fixed-seed data set with generate_data.py:
+    'animals' animals and 'people' applicants and volunteers.
+    """
+    env = dict(os.environ, DB_PATH=db_path)
+    subprocess.run([sys.executable, 'generate_data.py', '--animals', str(animals), '--applicants', str(people),
+                    '--volunteers', str(people), '--vaccines', '0', '--foster', '0', '--seed', str(seed)],
+                   cwd=BASEDIR, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server, port, workers, env):
+    """
+    The function starts the app with the given server ('gunicorn' or 'uvicorn') and waits until it answers.
+    """
+    bind = f'127.0.0.1:{port}'
+    if server == 'gunicorn':
+        command = ['gunicorn', '-c', 'gunicorn.conf.py', '-b', bind, '-w', str(workers), 'wsgi:app']
+    else:
+        command = ['uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+                   '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=BASEDIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{server} exited with status {process.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'{server} did not answer on {bind}')
+
+
+def client(number, host, port, mix, seed, warmup_until, deadline, results):
+    """
+    One closed-loop client: sends requests of the mix over a keep-alive connection until the deadline
+    and appends (scenario, seconds, status) of every request sent after the warm-up to results.
+    """
+    rng = random.Random(f'{seed}:{number}')
+    names, weights = list(mix), list(mix.values())
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    while True:
+        started = time.perf_counter()
+        if time.time() >= deadline:
+            break
+        name = rng.choices(names, weights)[0]
+        method, path, form = SCENARIOS[name](rng)
+        body = urlencode(form) if form is not None else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form is not None else {}
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            status = 0
+        if time.time() >= warmup_until:
+            results.append((name, time.perf_counter() - started, status))
+    conn.close()
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of sorted values
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+def summarize(results, elapsed):
+    """
+    The function returns the per-scenario and total statistics of the collected results.
+    Latencies are in milliseconds, a request counts as an error on a connection failure or a status >= 400.
+    """
+    by_scenario = {}
+    for name, seconds, status in results:
+        by_scenario.setdefault(name, []).append((seconds, status))
+    by_scenario['total'] = [(seconds, status) for name, seconds, status in results]
+    summary = {}
+    for name, samples in sorted(by_scenario.items()):
+        if not samples:
+            continue
+        latencies = sorted(seconds * 1000 for seconds, status in samples)
+        summary[name] = {
+            'requests': len(samples),
+            'errors': sum(1 for seconds, status in samples if status == 0 or status >= 400),
+            'throughput_rps': round(len(samples) / elapsed, 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'max_ms': round(latencies[-1], 3),
+        }
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASEDIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(text):
+    # 'view_animals=4,metrics=1' -> {'view_animals': 4, 'metrics': 1}
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'unknown scenario {name!r}, choose from {", ".join(SCENARIOS)}')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the app and report latency per route as JSON.')
+    parser.add_argument('--server', choices=('gunicorn', 'uvicorn'), default='gunicorn')
+    parser.add_argument('--url', help='test an already running server instead of starting one')
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of traffic before measuring')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help='scenario=weight,... (default: all)')
+    parser.add_argument('--animals', type=int, default=5000, help='animals in the seeded database')
+    parser.add_argument('--people', type=int, default=2000, help='applicants and volunteers in the seeded database')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the data set and of the request sequence')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    workdir = None
+    process = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        workdir = tempfile.mkdtemp(prefix='loadtest-')
+        db_path = os.path.join(workdir, 'loadtest.db')
+        seed_database(db_path, args.animals, args.people, args.seed)
+        metrics_dir = os.path.join(workdir, 'prometheus')
+        os.makedirs(metrics_dir)
+        env = dict(os.environ, DB_PATH=db_path, PROMETHEUS_MULTIPROC_DIR=metrics_dir)
+        host, port = '127.0.0.1', free_port()
+        process = start_server(args.server, port, args.workers, env)
+
+    try:
+        results = []
+        started = time.time()
+        warmup_until = started + args.warmup
+        deadline = warmup_until + args.duration
+        clients = [threading.Thread(target=client, args=(number, host, port, args.mix, args.seed, warmup_until,
+                                                         deadline, results))
+                   for number in range(args.concurrency)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.time() - warmup_until
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'commit': git_commit(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'config': {
+            'server': None if args.url else args.server, 'url': args.url, 'workers': args.workers,
+            'concurrency': args.concurrency, 'duration': args.duration, 'warmup': args.warmup, 'mix': args.mix,
+            'animals': args.animals, 'people': args.people, 'seed': args.seed,
+        },
+        'routes': summarize(results, elapsed),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
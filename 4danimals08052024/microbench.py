@@ -0,0 +1,255 @@
+# Micro-benchmarks of the per-request hot paths, e.g.
+#
+#     python3 microbench.py                                   # run all, print a table
+#     python3 microbench.py validate_form israeli_id          # run some
+#     python3 microbench.py --save-baseline                   # store the results as the new baseline
+#     python3 microbench.py --check                           # exit 1 if a benchmark regressed past the baseline
+#
+# Every benchmark is warmed up, then timed in repeats of auto-sized loops (median and spread are reported),
+# and run once more under tracemalloc for the memory it allocates per call (peak) and keeps (retained blocks).
+# The fastest repeat is also expressed relative to a fixed pure-Python calibration loop, the baseline stores and
+# compares that (the minimum is the least noisy estimate on a busy machine, the median shows the typical cost),
+# so it stays meaningful on a faster or slower machine.
+import argparse
+import atexit
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASEDIR, 'microbench_baseline.json')
+
+# Timed repeats per benchmark and seconds of untimed calls before them
+REPEATS = 7
+WARMUP_SECONDS = 0.1
+# Relative slow-down (of the calibrated minimum) or allocation growth tolerated by --check
+TOLERANCE = 0.25
+
+# Benchmark name -> setup function returning the callable to measure, see @benchmark
+BENCHMARKS = {}
+
+
+def benchmark(setup):
+    """
+    Decorator registering a benchmark: the setup function runs once, untimed, and returns the callable to measure.
+    """
+    BENCHMARKS[setup.__name__] = setup
+    return setup
+
+
+ANIMAL_FORM = {
+    "name": {"name": "name", "value": "Rexi", "required": True},
+    "gender": {"name": "gender", "value": "Male", "required": True},
+    "color": {"name": "color", "value": "Light brown", "required": True},
+    "birth_date": {"name": "birth_date", "value": "2023-01-15", "required": False},
+    "age": {"name": "age", "value": "1.5", "required": False},
+    "species": {"name": "species", "value": "Dog", "required": True},
+    "breed_name": {"name": "breed_name", "value": "Labrador", "required": False},
+    "chip_number": {"name": "chip_number", "value": "900000000000001", "required": False},
+    "spayed_neutered": {"name": "spayed_neutered", "value": True, "required": False},
+    "arrival": {"name": "arrival", "value": "2024-05-03", "required": True},
+    "current_owner": {"name": "current_owner", "value": "000000018", "required": False},
+    "vaccines": {"name": "vaccines", "value": "Rabies, Parvo", "required": False},
+}
+
+
+def _table_rows(count=1000):
+    from generate_data import TABLES
+    import random
+    columns, generator = TABLES['Animal']
+    return ['id'] + list(columns), [(index + 1,) + row for index, row in
+                                    enumerate(generator(random.Random(0), 0, count, range(100)))]
+
+
+@benchmark
+def calibration():
+    # Fixed pure-Python work, the unit the calibrated numbers are expressed in
+    def run():
+        total = 0
+        for number in range(1000):
+            total += number * number % 7
+        return total
+    return run
+
+
+@benchmark
+def validate_form():
+    from validate_fileds import validate_form
+    return lambda: validate_form(**ANIMAL_FORM)
+
+
+@benchmark
+def is_filed_valid():
+    from validate_fileds import is_filed_valid
+    fields = [(field['name'], field['value'], field['required']) for field in ANIMAL_FORM.values()]
+
+    def run():
+        for name, value, required in fields:
+            is_filed_valid(name, value, required)
+    return run
+
+
+@benchmark
+def israeli_id():
+    from validate_fileds import is_valid_israeli_id
+    return lambda: is_valid_israeli_id('000000018')
+
+
+@benchmark
+def convert_to_datetime():
+    # Importing the app builds it, point it at a throw-away database
+    if 'DB_PATH' not in os.environ:
+        workdir = tempfile.mkdtemp(prefix='microbench-')
+        atexit.register(shutil.rmtree, workdir, True)
+        os.environ['DB_PATH'] = os.path.join(workdir, 'microbench.db')
+    from app import convert_to_datetime
+    return lambda: convert_to_datetime('2024-05-08')
+
+
+@benchmark
+def table_records_1000():
+    # The row-to-dict loop of get_table_data (default shape) and its JSON encoding, 1000 Animal rows
+    import serializers
+    columns, rows = _table_rows()
+    return lambda: serializers.dumps(serializers.table_payload(columns, rows, 'records'))
+
+
+@benchmark
+def table_columnar_1000():
+    import serializers
+    columns, rows = _table_rows()
+    return lambda: serializers.dumps(serializers.table_payload(columns, rows, 'columnar'))
+
+
+def measure(run):
+    """
+    The function returns the timing and memory statistics of one benchmark callable.
+    """
+    timer = timeit.Timer(run)
+    # Warm-up: caches, lazy imports, specialization of the interpreter
+    warmup_until = time.perf_counter() + WARMUP_SECONDS
+    while time.perf_counter() < warmup_until:
+        run()
+    # Loops per repeat, sized (1, 2, 5, 10, ...) so that one repeat takes at least 0.2 s
+    loops = timer.autorange()[0]
+    per_call = sorted(total / loops for total in timer.repeat(REPEATS, loops))
+
+    # Memory: the peak allocated during one call (least of a few calls) and the blocks still held after many calls
+    tracemalloc.start()
+    peaks = []
+    for attempt in range(5):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        run()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    before = tracemalloc.take_snapshot()
+    for attempt in range(100):
+        run()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, 'lineno') if stat.count_diff > 0)
+
+    return {
+        'median_us': round(statistics.median(per_call) * 1e6, 3),
+        'min_us': round(per_call[0] * 1e6, 3),
+        'stdev_us': round(statistics.stdev(per_call) * 1e6, 3),
+        'loops': loops,
+        'repeats': REPEATS,
+        'peak_bytes': min(peaks),
+        'retained_blocks_per_100': retained,
+    }
+
+
+def run_benchmarks(names):
+    """
+    The function measures the named benchmarks (the calibration always runs first) and adds 'calibrated',
+    the fastest repeat relative to the one of the calibration loop.
+    """
+    results = {'calibration': measure(BENCHMARKS['calibration']())}
+    unit = results['calibration']['min_us']
+    for name in names:
+        if name == 'calibration':
+            continue
+        results[name] = measure(BENCHMARKS[name]())
+        results[name]['calibrated'] = round(results[name]['min_us'] / unit, 4)
+    return results
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """
+    The function compares results with a baseline and returns the regressions as (name, message):
+    a calibrated time or a per-call peak allocation more than 'tolerance' above the baseline.
+    """
+    messages = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if name == 'calibration' or expected is None:
+            continue
+        if result['calibrated'] > expected['calibrated'] * (1 + tolerance):
+            messages.append((name, f"{result['calibrated']} calibrated units, baseline {expected['calibrated']}"))
+        # A few bytes of slack, tiny allocations vary with the interpreter's free lists
+        if result['peak_bytes'] > expected['peak_bytes'] * (1 + tolerance) + 64:
+            messages.append((name, f"{result['peak_bytes']} bytes peak per call, baseline {expected['peak_bytes']}"))
+    return messages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of the request hot paths.')
+    parser.add_argument('names', nargs='*', help=f'benchmarks to run (default: all of {", ".join(BENCHMARKS)})')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 on a regression past the baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='tolerated relative regression')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f'unknown benchmark(s): {", ".join(unknown)}')
+    results = run_benchmarks(args.names or list(BENCHMARKS))
+
+    messages = []
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        messages = regressions(results, baseline, args.tolerance)
+        if messages:
+            # Measure the suspects once more, a regression has to show twice to count
+            again = run_benchmarks([name for name, message in messages])
+            for name, result in again.items():
+                if name != 'calibration' and result['calibrated'] < results[name]['calibrated']:
+                    results[name] = result
+            messages = regressions(results, baseline, args.tolerance)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f'{"benchmark":<22} {"min us":>10} {"median us":>11} {"stdev us":>10} {"calibrated":>11} '
+              f'{"peak B":>9} {"retained":>9}')
+        for name, result in results.items():
+            print(f'{name:<22} {result["min_us"]:>10} {result["median_us"]:>11} {result["stdev_us"]:>10} '
+                  f'{result.get("calibrated", 1):>11} {result["peak_bytes"]:>9} {result["retained_blocks_per_100"]:>9}')
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+    for name, message in messages:
+        print(f'REGRESSION {name}: {message}', file=sys.stderr)
+    if messages:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+from datetime import datetime
+
+from create_sql_db_using_python import create_database
+from db_pool import connect
+
+
+def _version_trigger(table, operation):
+    # Bump the change counter of a table on every row it gets written, see migration 3
+    return f'''CREATE TRIGGER IF NOT EXISTS {table.lower()}_version_{operation.lower()} AFTER {operation} ON {table} BEGIN
+               UPDATE table_versions SET version = version + 1 WHERE table_name = '{table.lower()}';
+           END'''
+
+
+# Ordered schema migrations: (version, description, statements).
+# Never edit a migration that has shipped, append a new one instead.
+# Every statement must be safe to re-run (IF NOT EXISTS / IF EXISTS), so a half-applied migration can be retried.
+MIGRATIONS = [
+    (1, 'indexes for the view filters', [
+        # view_animals: gender + age range, species / breed
+        'CREATE INDEX IF NOT EXISTS ix_animal_gender_age ON Animal (gender, age)',
+        'CREATE INDEX IF NOT EXISTS ix_animal_age ON Animal (age)',
+        'CREATE INDEX IF NOT EXISTS ix_animal_species_breed ON Animal (species, breed_name)',
+        # view_volunteers: city, animal_fostered, can_be_foster (only a minority of rows is set)
+        'CREATE INDEX IF NOT EXISTS ix_volunteers_city ON Volunteers (city)',
+        'CREATE INDEX IF NOT EXISTS ix_volunteers_animal_fostered ON Volunteers (animal_fostered)',
+        'CREATE INDEX IF NOT EXISTS ix_volunteers_can_be_foster ON Volunteers (id) WHERE can_be_foster = 1',
+        # view_adopters: city, owner_of, approved (only a minority of rows is set)
+        'CREATE INDEX IF NOT EXISTS ix_applicants_city ON Applicants (city)',
+        'CREATE INDEX IF NOT EXISTS ix_applicants_owner_of ON Applicants (owner_of)',
+        'CREATE INDEX IF NOT EXISTS ix_applicants_approved ON Applicants (id) WHERE approved = 1',
+        'ANALYZE',
+    ]),
+    (2, 'full-text search over animal text columns', [
+        # External content table: the text lives in Animal only, animal_fts holds just the index
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS animal_fts USING fts5(
+               name, species, breed_name, color, Vaccines,
+               content='Animal', content_rowid='id', prefix='2 3'
+           )''',
+        # Triggers keep the index in sync with every write to Animal
+        '''CREATE TRIGGER IF NOT EXISTS animal_fts_insert AFTER INSERT ON Animal BEGIN
+               INSERT INTO animal_fts (rowid, name, species, breed_name, color, Vaccines)
+               VALUES (new.id, new.name, new.species, new.breed_name, new.color, new.Vaccines);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS animal_fts_delete AFTER DELETE ON Animal BEGIN
+               INSERT INTO animal_fts (animal_fts, rowid, name, species, breed_name, color, Vaccines)
+               VALUES ('delete', old.id, old.name, old.species, old.breed_name, old.color, old.Vaccines);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS animal_fts_update AFTER UPDATE ON Animal BEGIN
+               INSERT INTO animal_fts (animal_fts, rowid, name, species, breed_name, color, Vaccines)
+               VALUES ('delete', old.id, old.name, old.species, old.breed_name, old.color, old.Vaccines);
+               INSERT INTO animal_fts (rowid, name, species, breed_name, color, Vaccines)
+               VALUES (new.id, new.name, new.species, new.breed_name, new.color, new.Vaccines);
+           END''',
+        # Index the rows that existed before the triggers
+        "INSERT INTO animal_fts (animal_fts) VALUES ('rebuild')",
+    ]),
+    (3, 'per-table change counters for ETags', [
+        '''CREATE TABLE IF NOT EXISTS table_versions (
+               table_name VARCHAR PRIMARY KEY,
+               version INTEGER NOT NULL DEFAULT 0
+           )''',
+        "INSERT OR IGNORE INTO table_versions (table_name) VALUES ('animal'), ('applicants'), ('volunteers')",
+        _version_trigger('Animal', 'INSERT'),
+        _version_trigger('Animal', 'UPDATE'),
+        _version_trigger('Animal', 'DELETE'),
+        _version_trigger('Applicants', 'INSERT'),
+        _version_trigger('Applicants', 'UPDATE'),
+        _version_trigger('Applicants', 'DELETE'),
+        _version_trigger('Volunteers', 'INSERT'),
+        _version_trigger('Volunteers', 'UPDATE'),
+        _version_trigger('Volunteers', 'DELETE'),
+    ]),
+    (4, 'trigram index for the species / breed substring filters', [
+        # Trigram tokens: a quoted term of 3+ characters matches anywhere inside the column, like LIKE '%term%',
+        # but is looked up in the index instead of scanning Animal
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS animal_trigram USING fts5(
+               species, breed_name,
+               content='Animal', content_rowid='id', tokenize='trigram'
+           )''',
+        '''CREATE TRIGGER IF NOT EXISTS animal_trigram_insert AFTER INSERT ON Animal BEGIN
+               INSERT INTO animal_trigram (rowid, species, breed_name) VALUES (new.id, new.species, new.breed_name);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS animal_trigram_delete AFTER DELETE ON Animal BEGIN
+               INSERT INTO animal_trigram (animal_trigram, rowid, species, breed_name)
+               VALUES ('delete', old.id, old.species, old.breed_name);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS animal_trigram_update AFTER UPDATE ON Animal BEGIN
+               INSERT INTO animal_trigram (animal_trigram, rowid, species, breed_name)
+               VALUES ('delete', old.id, old.species, old.breed_name);
+               INSERT INTO animal_trigram (rowid, species, breed_name) VALUES (new.id, new.species, new.breed_name);
+           END''',
+        # Index the rows that existed before the triggers
+        "INSERT INTO animal_trigram (animal_trigram) VALUES ('rebuild')",
+    ]),
+]
+
+
+def applied_version(conn):
+    """
+    The function returns the highest migration version recorded in the database, 0 for a fresh database.
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        description VARCHAR,
+                        applied_at DATETIME
+                     )''')
+    conn.commit()
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations').fetchone()[0]
+
+
+def latest_version():
+    """
+    The function returns the version the database ends up at once every migration is applied.
+    """
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def migrate(conn=None):
+    """
+    The function applies, in order, every migration newer than the version recorded in the database.
+    Each migration runs in its own write transaction together with its schema_migrations row, so pods starting
+    at the same time apply it exactly once and a failed migration leaves the previous version recorded.
+    Returns the list of versions that were applied by this call.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = connect()
+    # Manage transactions explicitly so DDL and the version row commit together
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    applied = []
+    try:
+        applied_version(conn)
+        for version, description, statements in MIGRATIONS:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Re-check under the write lock, another process may have applied it meanwhile
+                done = conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone()
+                if done:
+                    conn.execute('ROLLBACK')
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute('INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)',
+                             (version, description, datetime.utcnow().isoformat(sep=' ', timespec='seconds')))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(version)
+    finally:
+        conn.isolation_level = isolation_level
+        if own_conn:
+            conn.close()
+    return applied
+
+
+if __name__ == '__main__':
+    create_database()
+    applied = migrate()
+    print(f"Schema at version {latest_version()}, applied now: {applied or 'nothing'}")
@@ -0,0 +1,107 @@
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, Summary, generate_latest
+from prometheus_client import multiprocess
+
+import sql_trace
+
+# Latency buckets (seconds) around our SLOs: pages well under 250ms, admin exports within a few seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Label values are bounded: unknown methods collapse into OTHER and unmatched URLs into one endpoint
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+UNMATCHED_ENDPOINT = 'unmatched'
+
+REQUEST_COUNTER = Counter(
+    'http_requests_total',
+    'Total HTTP Requests (by status and method)',
+    ['method', 'endpoint', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency (by method and endpoint)',
+    ['method', 'endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_SIZE = Summary(
+    'http_request_size_bytes',
+    'HTTP request body size (by method and endpoint)',
+    ['method', 'endpoint']
+)
+RESPONSE_SIZE = Summary(
+    'http_response_size_bytes',
+    'HTTP response body size (by method and endpoint), streamed responses are not counted',
+    ['method', 'endpoint']
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'HTTP requests currently being handled',
+    multiprocess_mode='livesum'
+)
+DB_QUERY_DURATION = Histogram(
+    'http_request_db_duration_seconds',
+    'Total time spent in SQL statements per request (by endpoint)',
+    ['endpoint'],
+    buckets=DB_TIME_BUCKETS
+)
+DB_QUERY_COUNT = Histogram(
+    'http_request_db_queries',
+    'Number of SQL statements per request (by endpoint)',
+    ['endpoint'],
+    buckets=QUERY_COUNT_BUCKETS
+)
+
+
+def multiprocess_enabled():
+    """
+    The function tells whether prometheus_client runs in multiprocess mode (several gunicorn workers).
+    PROMETHEUS_MULTIPROC_DIR has to be set before prometheus_client is imported, gunicorn.conf.py takes care of that.
+    """
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def generate_metrics():
+    """
+    The function returns the metrics exposition for /metrics.
+    In multiprocess mode every metric is aggregated over all live workers, so any worker answering a scrape
+    reports the whole pod. Otherwise it is the process' own registry.
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_worker_dead(pid):
+    """
+    The function drops the live-gauge files of a worker that exited, called from gunicorn's child_exit hook.
+    """
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid)
+
+
+def method_label(method):
+    return method if method in KNOWN_METHODS else 'OTHER'
+
+
+def endpoint_label(endpoint):
+    return endpoint or UNMATCHED_ENDPOINT
+
+
+def observe_request(request, response, latency):
+    """
+    The function records every per-request metric once the response is ready, called from after_request.
+    """
+    method = method_label(request.method)
+    endpoint = endpoint_label(request.endpoint)
+    REQUEST_COUNTER.labels(method=method, endpoint=endpoint, status=response.status_code).inc()
+    REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(latency)
+    REQUEST_SIZE.labels(method=method, endpoint=endpoint).observe(request.content_length or 0)
+    if not response.is_streamed and response.content_length is not None:
+        RESPONSE_SIZE.labels(method=method, endpoint=endpoint).observe(response.content_length)
+    db_queries, db_time = sql_trace.request_totals()
+    DB_QUERY_DURATION.labels(endpoint=endpoint).observe(db_time)
+    DB_QUERY_COUNT.labels(endpoint=endpoint).observe(db_queries)
@@ -0,0 +1,139 @@
+import os
+
+from sqlalchemy import and_, or_
+
+# Page size used when the request does not ask for one, and the hard cap a request can ask for
+DEFAULT_PAGE_SIZE = int(os.environ.get('PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '200'))
+
+# Request values that drive paging rather than filtering
+CURSOR_FIELDS = ('after', 'before', 'page_size')
+
+
+class Page:
+    """
+    One page of a keyset (cursor) paginated listing.
+    'next_cursor' / 'prev_cursor' are the cursors to pass as 'after' / 'before' to reach the neighbouring pages,
+    or None when there is nothing in that direction. A cursor is the id of the edge row, or 'score:id' for
+    ranked listings.
+    """
+
+    def __init__(self, items, page_size, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _ranked_or_none(value):
+    try:
+        score, id = value.split(':')
+        return float(score), int(id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def page_args(values):
+    """
+    The function reads the cursor ('after' or 'before') and the page size from the request values.
+    The cursor is returned as sent, each paginate_* function parses the form it expects and ignores an invalid one.
+    The page size is clamped to 1..MAX_PAGE_SIZE.
+    """
+    after = values.get('after') or None
+    before = (values.get('before') or None) if after is None else None
+    page_size = _int_or_none(values.get('page_size')) or DEFAULT_PAGE_SIZE
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    return after, before, page_size
+
+
+def filter_values(form):
+    """
+    The function returns the non-empty filter fields of a submitted form, without the paging fields,
+    so the pager can re-submit the same filters together with a cursor.
+    """
+    return {key: value for key, value in form.items() if value and key not in CURSOR_FIELDS}
+
+
+def _make_page(rows, key, after, before, page_size):
+    """
+    The function turns up to page_size + 1 rows fetched in cursor direction into a Page.
+    The extra row only tells whether more rows exist beyond this page.
+    """
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before is not None:
+        # Rows were fetched backwards (id descending), put them back in display order
+        rows.reverse()
+    if not rows:
+        return Page(rows, page_size)
+    first, last = key(rows[0]), key(rows[-1])
+    if before is not None:
+        next_cursor = last
+        prev_cursor = first if has_more else None
+    else:
+        next_cursor = last if has_more else None
+        prev_cursor = first if after is not None else None
+    return Page(rows, page_size, next_cursor, prev_cursor)
+
+
+def paginate_table(conn, table, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    The function fetches one page of a whole table through a raw sqlite3 connection, seeking on the 'id' primary key.
+    'table' must be a trusted table name, never a request value.
+    """
+    after, before = _int_or_none(after), _int_or_none(before)
+    if before is not None:
+        sql = f'SELECT * FROM {table} WHERE id < ? ORDER BY id DESC LIMIT ?'
+        params = (before, page_size + 1)
+    elif after is not None:
+        sql = f'SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?'
+        params = (after, page_size + 1)
+    else:
+        sql = f'SELECT * FROM {table} ORDER BY id LIMIT ?'
+        params = (page_size + 1,)
+    rows = conn.execute(sql, params).fetchall()
+    return _make_page(rows, lambda row: row['id'], after, before, page_size)
+
+
+def paginate_query(query, id_column, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    The function fetches one page of a (filtered) SQLAlchemy query, seeking on id_column (e.g. Animal.id).
+    """
+    after, before = _int_or_none(after), _int_or_none(before)
+    if before is not None:
+        query = query.filter(id_column < before).order_by(id_column.desc())
+    elif after is not None:
+        query = query.filter(id_column > after).order_by(id_column)
+    else:
+        query = query.order_by(id_column)
+    rows = query.limit(page_size + 1).all()
+    return _make_page(rows, lambda row: row.id, after, before, page_size)
+
+
+def paginate_ranked(query, score_column, id_column, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    The function fetches one page of a relevance ranked SQLAlchemy query, best (lowest) score first.
+    It seeks on the (score, id) pair, so paging stays correct when many rows share a score.
+    The query must select the entity together with score_column, the returned items are the entities only.
+    """
+    after, before = _ranked_or_none(after), _ranked_or_none(before)
+    if before is not None:
+        score, id = before
+        query = query.filter(or_(score_column < score, and_(score_column == score, id_column < id)))
+        query = query.order_by(score_column.desc(), id_column.desc())
+    else:
+        if after is not None:
+            score, id = after
+            query = query.filter(or_(score_column > score, and_(score_column == score, id_column > id)))
+        query = query.order_by(score_column, id_column)
+    rows = query.limit(page_size + 1).all()
+    page = _make_page(rows, lambda row: f'{row[1]!r}:{row[0].id}', after, before, page_size)
+    page.items = [row[0] for row in page.items]
+    return page
@@ -0,0 +1,158 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from time import time
+
+from flask import Response, current_app, request
+from prometheus_client import Counter
+
+import conditional
+
+# Seconds a cached page stays valid, 0 disables the cache. Entries are keyed on the change counters of their tables
+# in the database (table_versions, bumped by triggers on every write), so a write made by any worker process makes
+# the entries of every process stale at once: the TTL only bounds memory held by pages nobody asks for.
+CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', '30'))
+# Memory cap of the cached bodies per process, and a cap on the number of entries
+CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '1024'))
+
+# Rough per-entry overhead (key, headers, bookkeeping) added to the body size when enforcing the memory cap
+ENTRY_OVERHEAD = 512
+
+CACHE_HITS = Counter(
+    'response_cache_hits_total',
+    'Responses served from the response cache',
+    ['endpoint']
+)
+CACHE_MISSES = Counter(
+    'response_cache_misses_total',
+    'Responses rendered because they were not in the response cache',
+    ['endpoint']
+)
+CACHE_EVICTIONS = Counter(
+    'response_cache_evictions_total',
+    'Entries dropped from the response cache (by reason: lru, expired, stale)',
+    ['reason']
+)
+
+
+class ResponseCache:
+    """
+    An in-process LRU cache of rendered responses with a TTL and a memory cap.
+    Every entry remembers the versions (conditional.table_versions) of the tables it was built from, a lookup with
+    other versions finds it stale. The versions live in the database, so they are the same for every process.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, versions):
+        """
+        The function returns the cached (status, headers, body) for key, or None if missing, expired or built from
+        other table versions.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, tables, entry_versions, size, payload = entry
+            if expires < time() or entry_versions != versions:
+                self._drop(key, 'expired' if expires < time() else 'stale')
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def put(self, key, tables, versions, payload):
+        """
+        The function stores (status, headers, body) built from the given versions of tables under key,
+        evicting least recently used entries to stay within the memory and entry caps.
+        """
+        size = len(payload[2]) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key, None)
+            self._entries[key] = (time() + self.ttl, tables, versions, size, payload)
+            self.size += size
+            while self.size > self.max_bytes or len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)), 'lru')
+
+    def invalidate(self, table):
+        """
+        The function drops this process' entries built from a table. Only frees their memory early: after a write
+        the table's version has changed, so they would never be served again anyway.
+        """
+        table = table.lower()
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if table in entry[1]]:
+                self._drop(key, 'stale')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _drop(self, key, reason):
+        # Caller holds the lock
+        self.size -= self._entries.pop(key)[3]
+        if reason:
+            CACHE_EVICTIONS.labels(reason=reason).inc()
+
+
+cache = ResponseCache()
+
+
+def invalidate(*tables):
+    """
+    The function drops the cached responses built from the given tables in this process, call it after every write.
+    Other processes see the new table versions on their next lookup.
+    """
+    for table in tables:
+        cache.invalidate(table)
+
+
+def cached(*tables):
+    """
+    Decorator for a read view whose output depends only on the given tables, the URL and the submitted form.
+    The cache key is the endpoint, its URL arguments, every request value (query string and form fields)
+    and the Accept header, which can select the response format.
+    Streamed and non-200 responses are never cached, nor is anything while the table versions are not available.
+    Under conditional.etagged the versions its ETag was built from are reused, so a cached body always goes out
+    with the ETag of the versions it was rendered from.
+    Use '*' as a table to mean "the table named by the 'table' URL argument".
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if cache.ttl <= 0:
+                return view(*args, **kwargs)
+            depends_on = tuple(kwargs.get('table', '').lower() if table == '*' else table for table in tables)
+            key = (request.endpoint, request.method, tuple(sorted(kwargs.items())),
+                   tuple(sorted(request.values.items(multi=True))), request.headers.get('Accept'))
+            versions = conditional.current_versions(depends_on)
+            if versions is None:
+                return view(*args, **kwargs)
+            payload = cache.get(key, versions)
+            if payload is not None:
+                CACHE_HITS.labels(endpoint=request.endpoint).inc()
+                status, headers, body = payload
+                response = Response(body, status=status, headers=headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            CACHE_MISSES.labels(endpoint=request.endpoint).inc()
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.put(key, depends_on, versions,
+                          (response.status_code, list(response.headers), response.get_data()))
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
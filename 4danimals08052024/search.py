@@ -0,0 +1,67 @@
+import re
+
+from sqlalchemy import Float, Integer, text
+
+# Animal columns in the animal_trigram index (see migration 4 in migrations.py), searched by substring
+TRIGRAM_COLUMNS = ('species', 'breed_name')
+# Shortest term the trigram index can find, shorter ones are matched with LIKE
+TRIGRAM_MIN_LENGTH = 3
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def _terms(value):
+    """
+    The function turns free text into FTS5 prefix terms, e.g. 'lab retr' -> '"lab"* "retr"*'.
+    Only word characters survive, so user input can never inject FTS5 query syntax.
+    """
+    return ' '.join(f'"{token}"*' for token in _TOKEN.findall(value or ''))
+
+
+def match_expression(q=None):
+    """
+    The function builds the FTS5 MATCH expression of the free-text query 'q' for animal_fts,
+    e.g. match_expression(q='lab retr') -> '"lab"* "retr"*'. Returns None when there is nothing to search for.
+    """
+    return _terms(q) or None
+
+
+def substring_filters(model, **columns):
+    """
+    The function returns the SQLAlchemy criteria matching each given column of the model (Animal) anywhere inside,
+    case-insensitively, like ILIKE '%value%': terms of TRIGRAM_MIN_LENGTH characters or more from the
+    animal_trigram index, all in one lookup, shorter ones with LIKE.
+    e.g. substring_filters(Animal, breed_name='retriever') finds 'Golden Retriever' and 'Goldenretriever'.
+    """
+    criteria = []
+    phrases = []
+    for column, value in columns.items():
+        if column not in TRIGRAM_COLUMNS:
+            raise ValueError(f"{column} is not a trigram indexed column")
+        if not value:
+            continue
+        if len(value) >= TRIGRAM_MIN_LENGTH:
+            # A quoted string is one phrase, doubling its quotes is all the escaping FTS5 needs
+            phrase = value.replace('"', '""')
+            phrases.append(f'{column} : "{phrase}"')
+        else:
+            criteria.append(getattr(model, column).icontains(value, autoescape=True))
+    if phrases:
+        # Its own parameter name, the fts_ranking subquery of the same statement binds :match
+        matching = text('SELECT rowid FROM animal_trigram WHERE animal_trigram MATCH :substrings').bindparams(
+            substrings=' AND '.join(phrases))
+        criteria.insert(0, model.id.in_(matching))
+    return criteria
+
+
+def fts_ranking(match):
+    """
+    The function returns a subquery of (id, score) for the animals matching the FTS5 expression.
+    The score is bm25() relevance, lower is better. Join it to Animal on id to filter and rank a query.
+    """
+    return (
+        text('SELECT rowid AS id, bm25(animal_fts) AS score FROM animal_fts WHERE animal_fts MATCH :match')
+        .bindparams(match=match)
+        .columns(id=Integer, score=Float)
+        .subquery('fts')
+    )
@@ -0,0 +1,129 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+from validate_fileds import BOOLEAN_COLUMNS
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib json encoder is the fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack responses are only offered when msgpack is installed
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Shapes of a table payload: a list of row objects, or {"columns": [...], "rows": [[...], ...]}
+# which names every column once instead of on every row
+SHAPES = ('records', 'columnar')
+
+
+def _default(value):
+    """
+    The function encodes the values the encoders do not know natively, the same way for every format:
+    dates and datetimes as ISO 8601 strings, decimals as floats.
+    """
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not serializable')
+
+
+def dumps(obj, sort_keys=False, indent=None):
+    """
+    The function encodes obj as JSON bytes, with orjson when it is installed.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    separators = None if indent else (',', ':')
+    return json.dumps(obj, default=_default, sort_keys=sort_keys, indent=indent, separators=separators,
+                      ensure_ascii=False).encode()
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider (app.json) backing jsonify and every JSON route with dumps():
+    orjson when available, dates as ISO 8601 instead of Flask's HTTP date format.
+    """
+    default = staticmethod(_default)
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys), indent=kwargs.get('indent')).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
+def response_mimetype():
+    """
+    The function returns the content type to answer the current request with: MessagePack when asked for
+    ('?format=msgpack' or the Accept header) and available, JSON otherwise.
+    """
+    if msgpack is None:
+        return JSON_MIMETYPE
+    if request.args.get('format') == 'msgpack':
+        return MSGPACK_MIMETYPES[0]
+    best = request.accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES, default=JSON_MIMETYPE)
+    return MSGPACK_MIMETYPES[0] if best in MSGPACK_MIMETYPES else JSON_MIMETYPE
+
+
+def respond(obj, status=200):
+    """
+    The function returns obj as a JSON or MessagePack response, whichever the client negotiated.
+    """
+    mimetype = response_mimetype()
+    if mimetype == JSON_MIMETYPE:
+        response = Response(dumps(obj), status=status, mimetype=mimetype)
+    else:
+        response = Response(msgpack.packb(obj, default=_default), status=status, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+
+def boolean_rows(columns, rows):
+    """
+    The function returns the rows with the values of the boolean columns (stored by SQLite as 0 / 1) as bools,
+    the rows themselves when the query has no boolean column.
+    """
+    flags = [index for index, column in enumerate(columns) if column.lower() in BOOLEAN_COLUMNS]
+    if flags:
+        rows = [list(row) for row in rows]
+        for row in rows:
+            for index in flags:
+                if row[index] is not None:
+                    row[index] = bool(row[index])
+    return rows
+
+
+def table_payload(columns, rows, shape='records'):
+    """
+    The function turns the column names and row tuples (or lists) of a query into the payload of the requested shape.
+    Boolean columns (stored by SQLite as 0 / 1) are encoded as true / false in both shapes.
+    """
+    rows = boolean_rows(columns, rows)
+    if shape == 'columnar':
+        return {'columns': columns, 'rows': rows}
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def table_shape():
+    """
+    The function returns the payload shape asked for with '?shape=', 'records' by default.
+    """
+    shape = request.args.get('shape')
+    return shape if shape in SHAPES else 'records'
@@ -0,0 +1,170 @@
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+
+from flask import g, has_request_context, request
+
+import db_pool
+
+# Statements slower than this (milliseconds, execute + fetch) go to the slow-query log with their query plan
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+# Statements kept per request for the slow-query check, the totals keep counting beyond it
+MAX_STATEMENTS_PER_REQUEST = 500
+# Slow statements waiting for their query plan, beyond it they are logged without one
+EXPLAIN_QUEUE_SIZE = 100
+
+# The slow-query log is the 'sql.slow' logger of the structured logging (app_logging): one JSON line per statement
+# with the request id and the query plan. LOG_LEVELS=sql.slow=ERROR turns it off.
+slow_query_logger = logging.getLogger('sql.slow')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+
+def normalize(statement):
+    """
+    The function reduces a statement to its shape: literals become '?', 'IN (?, ?, ?)' becomes 'IN (?...)'
+    and whitespace is collapsed, so the same query with different values groups together.
+    """
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _IN_LIST.sub('(?...)', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+def explain(conn, statement, parameters):
+    """
+    The function returns the EXPLAIN QUERY PLAN lines of a statement, run on the given connection.
+    """
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE) or parameters is None:
+        return []
+    rows = conn.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+class Explainer:
+    """
+    A thread that adds the query plan to the slow statements and logs them, so the request that was already slow
+    does not also wait for an EXPLAIN. It keeps one connection of its own, opened when first needed.
+    """
+
+    def __init__(self, size=EXPLAIN_QUEUE_SIZE):
+        self._queue = queue.Queue(size)
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name='sql-explain', daemon=True)
+        self._thread.start()
+
+    def submit(self, fields, statement, parameters):
+        """
+        The function queues a slow statement with the fields of its log record,
+        a full queue logs it right away without the plan.
+        """
+        try:
+            self._queue.put_nowait((fields, statement, parameters))
+        except queue.Full:
+            slow_query_logger.warning('Slow query', extra=dict(fields, plan=['unavailable: explain queue full']))
+
+    def _run(self):
+        while True:
+            fields, statement, parameters = self._queue.get()
+            try:
+                if self._conn is None:
+                    self._conn = db_pool.connect()
+                fields['plan'] = explain(self._conn, statement, parameters)
+            except sqlite3.Error as error:
+                fields['plan'] = [f'unavailable: {error}']
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+            slow_query_logger.warning('Slow query', extra=fields)
+
+
+_explainer = None
+_explainer_pid = None
+_explainer_lock = threading.Lock()
+
+
+def get_explainer():
+    """
+    The function returns the Explainer of the current process, a forked worker starts its own.
+    """
+    global _explainer, _explainer_pid
+    pid = os.getpid()
+    if _explainer is None or _explainer_pid != pid:
+        with _explainer_lock:
+            if _explainer is None or _explainer_pid != pid:
+                _explainer = Explainer()
+                _explainer_pid = pid
+    return _explainer
+
+
+def log_if_slow(record, endpoint=None):
+    """
+    The function hands a statement to the slow-query log if it took longer than SLOW_QUERY_MS.
+    The plan is added and the record logged by the Explainer thread.
+    """
+    duration_ms = record.duration * 1000
+    if duration_ms < SLOW_QUERY_MS or not slow_query_logger.isEnabledFor(logging.WARNING):
+        return
+    get_explainer().submit({
+        'endpoint': endpoint,
+        'request_id': g.get('request_id') if has_request_context() else None,
+        'statement': normalize(record.statement),
+        'duration_ms': round(duration_ms, 3),
+        'rowcount': record.rowcount,
+        'rows': record.rows,
+    }, record.statement, record.parameters)
+
+
+def start_request():
+    """
+    The function resets the per-request statement list and totals, called from before_request.
+    """
+    g.sql_records = []
+    g.sql_count = 0
+    g.sql_time = 0.0
+
+
+def record_query(record):
+    """
+    Query listener (see db_pool.add_query_listener): keeps the statements of the current request.
+    Statements outside a request (startup, migrations, streamed exports) are checked for slowness right away.
+    The totals count every statement, the list keeps only the first MAX_STATEMENTS_PER_REQUEST.
+    """
+    if has_request_context() and 'sql_records' in g:
+        g.sql_count += 1
+        g.sql_time += record.duration
+        if len(g.sql_records) < MAX_STATEMENTS_PER_REQUEST:
+            g.sql_records.append(record)
+    else:
+        log_if_slow(record)
+
+
+def request_totals():
+    """
+    The function returns (statement count, total seconds in SQL) for the current request.
+    """
+    return g.get('sql_count', 0), g.get('sql_time', 0.0)
+
+
+def finish_request(response, latency):
+    """
+    The function logs the slow statements of the request and adds a Server-Timing header with the SQL totals,
+    called from after_request.
+    """
+    for record in g.get('sql_records', ()):
+        log_if_slow(record, request.endpoint)
+    count, duration = request_totals()
+    response.headers['Server-Timing'] = (
+        f'db;dur={duration * 1000:.2f};desc="{count} queries", app;dur={latency * 1000:.2f}'
+    )
+    return response
+
+
+db_pool.add_query_listener(record_query)
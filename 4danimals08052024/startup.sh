@@ -1,11 +1,9 @@
 #!/bin/bash
- #
- ## Run script to create database
- python3 create_sql_db_using_python.py
- #
+#
+## Create the database if needed and apply pending schema migrations (indexes etc.), safe to run on every start
+python3 migrations.py || exit 1
+#
 
- sleep 10
- ## Run the Flask application
-
- python3 app.py --host=0.0.0.0 --port=8080
- exec "$@"
\ No newline at end of file
+## Run the application given as the command (the Dockerfile CMD), no fixed delay:
+## it warms up before listening and reports ready on /readyz
+exec "$@"
@@ -0,0 +1,84 @@
+import csv
+import io
+import os
+
+import db_pool
+import serializers
+
+# Rows fetched from the cursor per round trip while streaming an export
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Streaming formats and their content types
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_format(request):
+    """
+    The function returns the streaming format asked for by the request, or None for the regular JSON response.
+    An explicit '?format=ndjson|csv' wins over the Accept header.
+    """
+    requested = request.args.get('format')
+    if requested in EXPORT_FORMATS:
+        return requested
+    best = request.accept_mimetypes.best_match(['application/json'] + list(EXPORT_FORMATS.values()))
+    for name, mimetype in EXPORT_FORMATS.items():
+        if best == mimetype:
+            return name
+    return None
+
+
+def iter_batches(sql, params=(), batch_size=EXPORT_BATCH_SIZE):
+    """
+    The generator runs a query on a pooled connection and yields the column names once,
+    then lists of at most batch_size rows, boolean columns as bools like serializers.table_payload sends them.
+    The connection goes back to the pool when the generator is exhausted or closed by the client disconnecting.
+    """
+    with db_pool.get_pool().connection() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(sql, params)
+        columns = [column[0] for column in cur.description]
+        yield columns
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield serializers.boolean_rows(columns, rows)
+
+
+def ndjson_chunks(batches):
+    """
+    The generator encodes the output of iter_batches as newline-delimited JSON, one chunk per batch.
+    """
+    columns = next(batches)
+    for rows in batches:
+        yield b''.join(serializers.dumps(dict(zip(columns, row))) + b'\n' for row in rows)
+
+
+def csv_chunks(batches):
+    """
+    The generator encodes the output of iter_batches as CSV with a header line, one chunk per batch.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(next(batches))
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def stream_table(query, fmt, batch_size=EXPORT_BATCH_SIZE):
+    """
+    The function returns the (chunk generator, content type) pair that streams the rows of a table query
+    (a table_query.TableQuery, validated projection / filters / order) in the given format.
+    """
+    sql, params = query.statement()
+    batches = iter_batches(sql, params, batch_size=batch_size)
+    chunks = ndjson_chunks(batches) if fmt == 'ndjson' else csv_chunks(batches)
+    return chunks, EXPORT_FORMATS[fmt]
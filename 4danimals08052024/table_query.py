@@ -0,0 +1,173 @@
+import os
+
+from validate_fileds import BOOLEAN_COLUMNS, TRUE_VALUES
+
+# Rows returned by /admin/get_table_data when the request does not ask for a limit, and the most it can ask for.
+# Streamed exports are not limited unless the request says so.
+DEFAULT_LIMIT = int(os.environ.get('TABLE_DATA_LIMIT', '100'))
+MAX_LIMIT = int(os.environ.get('TABLE_DATA_MAX_LIMIT', '1000'))
+
+# Columns a request may project, filter and sort on, per table, spelled as in the schema
+TABLE_COLUMNS = {
+    'animal': ('id', 'name', 'gender', 'color', 'birth_date', 'age', 'species', 'breed_name', 'chip_number',
+               'spayed_neutered', 'arrival', 'foster', 'current_owner', 'Vaccines'),
+    'applicants': ('id', 'full_name', 'teudat_zehut', 'address', 'city', 'mail', 'phone', 'approved', 'owner_of'),
+    'volunteers': ('id', 'full_name', 'teudat_zehut', 'address', 'city', 'mail', 'phone', 'job_function',
+                   'can_be_foster', 'animal_fostered'),
+}
+
+# Query parameters that shape the result rather than filter it
+CONTROL_ARGS = ('columns', 'sort', 'limit', 'offset', 'after', 'format', 'shape')
+RANGE_SUFFIXES = {'_min': '>=', '_max': '<='}
+
+
+class QueryError(ValueError):
+    """
+    Raised for query parameters that do not describe a valid query of the table.
+    """
+
+
+class TableQuery:
+    """
+    A validated query of one admin table: projected columns, WHERE clauses with their parameters,
+    ORDER BY terms and the paging window. Only known column names ever reach the SQL text,
+    every value is a bound parameter.
+    """
+
+    def __init__(self, table, columns, where, params, order_by, limit, offset, after):
+        self.table = table
+        self.columns = columns
+        self.where = where
+        self.params = params
+        self.order_by = order_by
+        self.limit = limit
+        self.offset = offset
+        self.after = after
+
+    @property
+    def by_id(self):
+        # Ordered by id alone, so the id of the last row is a keyset cursor
+        return self.order_by == ['id']
+
+    def statement(self, extra=0):
+        """
+        The function returns the (sql, params) of the query, fetching 'extra' rows beyond the limit
+        (one extra row tells whether a next page exists).
+        """
+        where, params = list(self.where), list(self.params)
+        if self.after is not None:
+            where.append('id > ?')
+            params.append(self.after)
+        sql = f'SELECT {", ".join(self.columns)} FROM {self.table}'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY ' + ', '.join(self.order_by)
+        if self.limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [self.limit + extra, self.offset]
+        return sql, params
+
+    def next_args(self, rows):
+        """
+        The function returns the query parameters that fetch the page after 'rows' (fetched with statement(extra=1)),
+        or None on the last page: an 'after' id cursor when ordered by id, the next 'offset' otherwise.
+        """
+        if self.limit is None or len(rows) <= self.limit:
+            return None
+        if self.by_id:
+            return {'after': rows[self.limit - 1][0], 'offset': None}
+        return {'offset': self.offset + self.limit}
+
+
+def _lookup(table, name):
+    # The schema spelling of a column name, or None. SQLite column names are case-insensitive.
+    for column in TABLE_COLUMNS[table]:
+        if column.lower() == name.lower():
+            return column
+    return None
+
+
+def _column(table, name):
+    column = _lookup(table, name)
+    if column is None:
+        raise QueryError(f'Unknown column {name!r} for table {table}')
+    return column
+
+
+def _filter_column(table, name):
+    # (column, operator) of a filter parameter: '<column>', '<column>_min' or '<column>_max'
+    column = _lookup(table, name)
+    if column is not None:
+        return column, '='
+    for suffix, operator in RANGE_SUFFIXES.items():
+        column = _lookup(table, name[:-len(suffix)]) if name.lower().endswith(suffix) else None
+        if column is not None:
+            return column, operator
+    raise QueryError(f'Unknown column {name!r} for table {table}')
+
+
+def _value(column, value):
+    if column.lower() in BOOLEAN_COLUMNS:
+        return 1 if value.lower() in TRUE_VALUES else 0
+    return value
+
+
+def _non_negative_int(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    if not value.isdigit():
+        raise QueryError(f'{name} must be a non-negative integer')
+    return int(value)
+
+
+def parse(table, args, paged=True):
+    """
+    The function validates the query parameters of a table request and returns the TableQuery:
+      columns=a,b,c          projection ('id' is always included, it keys the rows)
+      <column>=value         equality, repeat the parameter to match any of several values
+      <column>_min / _max    inclusive range
+      sort=a,-b              order, '-' for descending, 'id' breaks ties
+      limit, offset / after  paging window, 'after' is an id cursor and needs the default id order
+    With paged=True (JSON responses) the limit defaults to DEFAULT_LIMIT and is capped at MAX_LIMIT.
+    'table' must be one of TABLE_COLUMNS.
+    """
+    table = table.lower()
+    if args.get('columns'):
+        columns = ['id'] + [_column(table, name.strip()) for name in args['columns'].split(',') if name.strip()]
+        columns = list(dict.fromkeys(columns))
+    else:
+        columns = list(TABLE_COLUMNS[table])
+
+    where, params = [], []
+    for name in args:
+        if name in CONTROL_ARGS:
+            continue
+        column, operator = _filter_column(table, name)
+        values = [_value(column, value) for value in args.getlist(name)]
+        if operator == '=' and len(values) > 1:
+            where.append(f'{column} IN ({", ".join("?" * len(values))})')
+            params += values
+        else:
+            where += [f'{column} {operator} ?' for value in values]
+            params += values
+
+    order_by = []
+    for term in (args.get('sort') or '').split(','):
+        term = term.strip()
+        if term:
+            column = _column(table, term.lstrip('-'))
+            order_by.append(f'{column} DESC' if term.startswith('-') else column)
+    if 'id' not in (term.split(' ')[0] for term in order_by):
+        order_by.append('id')
+
+    limit = _non_negative_int(args, 'limit')
+    if paged:
+        limit = min(limit or DEFAULT_LIMIT, MAX_LIMIT)
+    offset = _non_negative_int(args, 'offset') or 0
+    after = _non_negative_int(args, 'after')
+    if after is not None and order_by != ['id']:
+        raise QueryError("'after' only works with the default id order, use 'offset' with 'sort'")
+    if limit is None and offset:
+        limit = -1  # SQLite needs a LIMIT for an OFFSET, -1 means no limit
+    return TableQuery(table, columns, where, params, order_by, limit, offset, after)
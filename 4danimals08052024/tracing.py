@@ -0,0 +1,382 @@
+import atexit
+import fcntl
+import os
+import queue
+import random
+import re
+import threading
+from contextlib import contextmanager
+from time import perf_counter_ns, time_ns
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from prometheus_client import Counter
+
+import db_pool
+import serializers
+import sql_trace
+
+# Request tracing: a trace per request with spans for form parsing, validation, every SQL statement and template
+# rendering, written as OTLP/JSON lines (one ExportTraceServiceRequest per line, the format of the OpenTelemetry
+# collector's file exporter / otlpjsonfile receiver) to a size-rotated file shared by the workers of a pod.
+# Off unless TRACE_FILE is set.
+TRACE_FILE = os.environ.get('TRACE_FILE', '')
+# Head sampling: share of requests traced, decided when the request starts (a sampled W3C traceparent is honoured)
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.01'))
+# Requests slower than this (milliseconds) are written whether sampled or not, 0 turns it off.
+# Trade-off: only sampled requests record child spans (form parsing, SQL statements, templates), as recording them
+# for every request would cost each one the span bookkeeping just in case it turns out slow. A slow request that
+# was not sampled is therefore written as its root span only, with the SQL statement count and time as attributes.
+# To see inside slow requests, raise TRACE_SAMPLE_RATE (or send a sampled traceparent) for the route in question.
+TRACE_SLOW_MS = float(os.environ.get('TRACE_SLOW_MS', '500'))
+TRACE_FILE_MAX_BYTES = int(os.environ.get('TRACE_FILE_MAX_BYTES', str(50 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = int(os.environ.get('TRACE_FILE_BACKUPS', '3'))
+SERVICE_NAME = os.environ.get('TRACE_SERVICE_NAME', '4danimals')
+# Spans kept per trace, the request is still timed beyond it
+MAX_SPANS = 1000
+# Traces waiting for the writer thread, beyond it they are dropped rather than slowing requests down
+QUEUE_SIZE = 1000
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+TRACES_EXPORTED = Counter(
+    'traces_exported_total',
+    'Request traces written to the trace file (by reason: head sampled or slow)',
+    ['reason']
+)
+TRACES_DROPPED = Counter(
+    'traces_dropped_total',
+    'Request traces dropped because the trace writer queue was full'
+)
+
+_TRACEPARENT = re.compile(r'00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})')
+_TRACE_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class Trace:
+    """
+    The spans of one request as plain tuples (name, start, end, attributes, kind) on the perf_counter_ns clock,
+    turned into OTLP only if the trace is written.
+    """
+    __slots__ = ('trace_id', 'parent_id', 'sampled', 'recording', 'wall_base', 'clock_base', 'start', 'end',
+                 'name', 'attributes', 'spans', 'dropped', 'open_templates')
+
+    def __init__(self, trace_id, parent_id, sampled):
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.sampled = sampled
+        # Child spans are recorded for sampled requests only, see TRACE_SLOW_MS
+        self.recording = sampled
+        self.wall_base = time_ns()
+        self.clock_base = self.start = perf_counter_ns()
+        self.end = None
+        self.name = None
+        self.attributes = {}
+        self.spans = []
+        self.dropped = 0
+        self.open_templates = []
+
+    def add(self, name, start, end, attributes=None, kind=KIND_INTERNAL):
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((name, start, end, attributes, kind))
+        else:
+            self.dropped += 1
+
+
+def current():
+    """
+    The function returns the recording Trace of the current request, or None.
+    """
+    if not has_request_context():
+        return None
+    trace = g.get('_trace')
+    return trace if trace is not None and trace.recording else None
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Context manager timing a block as a span of the current request's trace: 'with tracing.span("validate_form"):'.
+    Outside a recorded request it only costs the check.
+    """
+    trace = current()
+    if trace is None:
+        yield
+        return
+    start = perf_counter_ns()
+    try:
+        yield
+    finally:
+        trace.add(name, start, perf_counter_ns(), attributes or None)
+
+
+def start_request(request_id=None):
+    """
+    The function starts the trace of the current request, called from before_request: continues the caller's
+    W3C traceparent when there is one, otherwise uses the request id as trace id when it has the right shape,
+    so log lines and traces correlate.
+    """
+    parent = _TRACEPARENT.fullmatch(request.environ.get('HTTP_TRACEPARENT', ''))
+    if parent:
+        trace_id, parent_id, sampled = parent.group(1), parent.group(2), int(parent.group(3), 16) & 1 == 1
+        sampled = sampled or random.random() < TRACE_SAMPLE_RATE
+    else:
+        trace_id = request_id if request_id and _TRACE_ID.fullmatch(request_id) else os.urandom(16).hex()
+        parent_id, sampled = None, random.random() < TRACE_SAMPLE_RATE
+    trace = g._trace = Trace(trace_id, parent_id, sampled)
+    if trace.recording and request.method in ('POST', 'PUT', 'PATCH') and request.mimetype in (
+            'application/x-www-form-urlencoded', 'multipart/form-data'):
+        # Parse the form now, inside a span, the views read it from Flask's cache
+        start = perf_counter_ns()
+        request.form
+        trace.add('parse_form', start, perf_counter_ns(), {'http.request_content_length': request.content_length})
+
+
+def finish_request(response):
+    """
+    The function notes the route and status of the response on the trace, called from after_request.
+    """
+    trace = g.get('_trace')
+    if trace is not None:
+        trace.attributes['http.status_code'] = response.status_code
+    return response
+
+
+def end_request(exception=None):
+    """
+    The function ends the trace of the current request and hands it to the writer if it was sampled or slow,
+    called from teardown_request (so failed requests are traced too). A slow request that was not sampled is
+    written with its root span only.
+    """
+    trace = g.pop('_trace', None)
+    if trace is None:
+        return
+    trace.end = perf_counter_ns()
+    slow = TRACE_SLOW_MS > 0 and (trace.end - trace.start) >= TRACE_SLOW_MS * 1e6
+    if not (trace.sampled or slow):
+        return
+    rule = request.url_rule.rule if request.url_rule is not None else None
+    trace.name = f'{request.method} {rule or "unmatched"}'
+    trace.attributes.update({
+        'http.method': request.method,
+        'http.route': rule,
+        'http.target': request.path,
+        'request_id': g.get('request_id'),
+        'sampling.reason': 'head' if trace.sampled else 'slow',
+    })
+    # Cheap totals kept for every request, the only look inside a slow trace that was not sampled
+    db_statements, db_time = sql_trace.request_totals()
+    trace.attributes['db.statements'] = db_statements
+    trace.attributes['db.duration_ms'] = round(db_time * 1000, 3)
+    if exception is not None:
+        trace.attributes['exception.type'] = type(exception).__name__
+        trace.attributes.setdefault('http.status_code', 500)
+    if trace.dropped:
+        trace.attributes['spans.dropped'] = trace.dropped
+    get_writer().submit(trace)
+
+
+def record_query(record):
+    """
+    Query listener (see db_pool.add_query_listener): a span per SQL statement of a recorded request.
+    The record is only read when the trace is written, by then it includes the time spent fetching rows.
+    """
+    trace = current()
+    if trace is not None:
+        end = perf_counter_ns()
+        trace.add(record, end - int(record.duration * 1e9), None, None, KIND_CLIENT)
+
+
+def _template_started(app, template, context, **extra):
+    trace = current()
+    if trace is not None:
+        trace.open_templates.append(perf_counter_ns())
+
+
+def _template_rendered(app, template, context, **extra):
+    trace = current()
+    if trace is not None and trace.open_templates:
+        trace.add('render_template', trace.open_templates.pop(), perf_counter_ns(), {'template': template.name})
+
+
+def _value(value):
+    # OTLP AnyValue
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _attributes(attributes):
+    return [{'key': key, 'value': _value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otlp(trace):
+    """
+    The function turns a finished Trace into an OTLP/JSON ExportTraceServiceRequest. Spans are nested by time:
+    a span's parent is the innermost span that contains it, the request span at the top.
+    """
+    def wall(clock):
+        return trace.wall_base + (clock - trace.clock_base)
+
+    root_id = os.urandom(8).hex()
+    root = {
+        'traceId': trace.trace_id, 'spanId': root_id, 'name': trace.name, 'kind': KIND_SERVER,
+        'startTimeUnixNano': str(wall(trace.start)), 'endTimeUnixNano': str(wall(trace.end)),
+        'attributes': _attributes(trace.attributes),
+        'status': {'code': 2} if trace.attributes.get('http.status_code', 200) >= 500 else {},
+    }
+    if trace.parent_id:
+        root['parentSpanId'] = trace.parent_id
+
+    spans = []
+    for index, (name, start, end, attributes, kind) in enumerate(trace.spans):
+        if isinstance(name, db_pool.QueryRecord):
+            record = name
+            end = start + int(record.duration * 1e9)
+            name = 'db.query'
+            attributes = {'db.system': 'sqlite', 'db.statement': sql_trace.normalize(record.statement),
+                          'db.rows': record.rows, 'db.rowcount': record.rowcount}
+        # Earlier first, the longer of two spans starting together first (it contains the other)
+        spans.append((start, -end, index, name, end, attributes, kind))
+    spans.sort()
+
+    result = [root]
+    # Open spans as (end, span id), innermost last
+    stack = [(trace.end, root_id)]
+    for start, _, _, name, end, attributes, kind in spans:
+        while len(stack) > 1 and stack[-1][0] < end:
+            stack.pop()
+        span_id = os.urandom(8).hex()
+        result.append({
+            'traceId': trace.trace_id, 'spanId': span_id, 'parentSpanId': stack[-1][1], 'name': name, 'kind': kind,
+            'startTimeUnixNano': str(wall(start)), 'endTimeUnixNano': str(wall(end)),
+            'attributes': _attributes(attributes or {}),
+        })
+        stack.append((end, span_id))
+
+    return {'resourceSpans': [{
+        'resource': {'attributes': _attributes({'service.name': SERVICE_NAME, 'process.pid': os.getpid()})},
+        'scopeSpans': [{'scope': {'name': 'tracing'}, 'spans': result}],
+    }]}
+
+
+class TraceWriter:
+    """
+    Writes finished traces on a thread of its own, in batches, to TRACE_FILE. The file is shared by every process:
+    appends and the size-based rotation (TRACE_FILE.1 .. TRACE_FILE.<TRACE_FILE_BACKUPS>) happen under an
+    exclusive lock on TRACE_FILE.lock, and the file is reopened for every batch, so a rotation done by one worker
+    is seen by the others.
+    """
+
+    def __init__(self, path=TRACE_FILE, max_bytes=TRACE_FILE_MAX_BYTES, backups=TRACE_FILE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue = queue.Queue(QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, trace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            TRACES_DROPPED.inc()
+
+    def close(self, timeout=None):
+        """
+        The function writes the queued traces and stops the writer thread.
+        """
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+                batch = [trace for trace in batch if trace is not None]
+            lines = []
+            for trace in batch:
+                lines.append(serializers.dumps(to_otlp(trace)) + b'\n')
+                TRACES_EXPORTED.labels(reason=trace.attributes['sampling.reason']).inc()
+            if lines:
+                try:
+                    self._write(lines)
+                except OSError:
+                    TRACES_DROPPED.inc(len(lines))
+
+    def _write(self, lines):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    self._rotate()
+                with open(self.path, 'ab') as f:
+                    f.write(b''.join(lines))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{index}'):
+                os.replace(f'{self.path}.{index}', f'{self.path}.{index + 1}')
+        if self.backups:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    The function returns the trace writer of the current process, a worker forked from a preloaded master
+    gets a writer thread of its own.
+    """
+    global _writer, _writer_pid
+    pid = os.getpid()
+    if _writer is None or _writer_pid != pid:
+        with _writer_lock:
+            if _writer is None or _writer_pid != pid:
+                _writer = TraceWriter()
+                _writer_pid = pid
+                atexit.register(_writer.close, 2)
+    return _writer
+
+
+def init_app(app):
+    """
+    The function traces the requests of the app when TRACE_FILE is set: a trace starts in before_request
+    (register it right after the request id is assigned), SQL statements and template rendering add spans
+    on their own, views add theirs with span().
+    """
+    if not TRACE_FILE:
+        return
+
+    @app.before_request
+    def start_trace():
+        start_request(g.get('request_id'))
+
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+    db_pool.add_query_listener(record_query)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_rendered, app)
@@ -0,0 +1,171 @@
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from time import monotonic, time
+
+from prometheus_client import Histogram
+
+import db_pool
+
+# Optional group commit of the form writes (add_animal / add_adopter / add_volunteer): set WRITE_QUEUE=1.
+# Every process then has one writer thread that drains a queue of statements and commits them in groups,
+# one transaction (and one fsync) per group instead of per request, so concurrent writes no longer fight
+# over the SQLite write lock. A request still waits until its group is committed and durable.
+ENABLED = os.environ.get('WRITE_QUEUE', '0') == '1'
+# A group is committed once it has this many statements...
+GROUP_SIZE = int(os.environ.get('WRITE_QUEUE_GROUP_SIZE', '64'))
+# ...or this many milliseconds after its first statement arrived, whichever comes first
+GROUP_DELAY = float(os.environ.get('WRITE_QUEUE_GROUP_DELAY_MS', '2')) / 1000
+# Seconds a request waits for its group before giving up
+ACK_TIMEOUT = float(os.environ.get('WRITE_QUEUE_ACK_TIMEOUT', '30'))
+
+WRITE_GROUP_SIZE = Histogram(
+    'write_queue_group_size',
+    'Statements committed together in one write queue transaction',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+WRITE_ACK_LATENCY = Histogram(
+    'write_queue_ack_seconds',
+    'Time from submitting a statement to the write queue until its group is committed',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+class WriteQueue:
+    """
+    A queue of write statements drained by one writer thread of its own, see the comment at the top of the module.
+    Statements of a group run in one transaction, each inside a savepoint, so one failing statement
+    (e.g. a duplicate chip number) only fails its own request and the rest of the group commits.
+    """
+
+    def __init__(self, group_size=GROUP_SIZE, group_delay=GROUP_DELAY):
+        self.group_size = group_size
+        self.group_delay = group_delay
+        self._queue = queue.Queue()
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+        self._thread.start()
+
+    def submit(self, statement, params=()):
+        """
+        The function queues a statement and returns a Future resolved with (lastrowid, rowcount)
+        once the group it belongs to is committed, or with the error of the statement or of the commit.
+        """
+        future = Future()
+        self._queue.put((statement, params, future, time()))
+        return future
+
+    def close(self, timeout=None):
+        """
+        The function commits what is queued and stops the writer thread.
+        """
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _connect(self):
+        conn = db_pool.connect()
+        # Transactions are managed explicitly, and a commit is durable (fsynced) before it is acknowledged
+        conn.isolation_level = None
+        conn.execute('PRAGMA synchronous = FULL')
+        return conn
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            group = [item]
+            deadline = monotonic() + self.group_delay
+            while len(group) < self.group_size:
+                try:
+                    # Whatever queued up while the previous group committed joins at once, then wait for the delay
+                    item = self._queue.get(timeout=max(0.0, deadline - monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                group.append(item)
+            self._commit(group)
+        if self._conn is not None:
+            self._conn.close()
+
+    def _commit(self, group):
+        results = []
+        try:
+            if self._conn is None:
+                self._conn = self._connect()
+            conn = self._conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for statement, params, future, submitted in group:
+                    conn.execute('SAVEPOINT write_queue')
+                    try:
+                        cursor = conn.execute(statement, params)
+                        results.append((future, (cursor.lastrowid, cursor.rowcount), None))
+                    except sqlite3.Error as error:
+                        conn.execute('ROLLBACK TO write_queue')
+                        results.append((future, None, error))
+                    conn.execute('RELEASE write_queue')
+                conn.execute('COMMIT')
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+        except Exception as error:
+            # Nothing of the group was committed: fail every request of it, start over with a fresh connection
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            results = [(future, None, error) for statement, params, future, submitted in group]
+
+        WRITE_GROUP_SIZE.observe(len(group))
+        now = time()
+        for (future, result, error), (statement, params, _, submitted) in zip(results, group):
+            WRITE_ACK_LATENCY.observe(now - submitted)
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_queue = None
+_queue_pid = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """
+    The function returns the write queue of the current process, a worker forked from a preloaded master
+    gets a writer thread (and a connection) of its own.
+    """
+    global _queue, _queue_pid
+    pid = os.getpid()
+    if _queue is None or _queue_pid != pid:
+        with _queue_lock:
+            if _queue is None or _queue_pid != pid:
+                _queue = WriteQueue()
+                _queue_pid = pid
+    return _queue
+
+
+def execute(statement, params=(), timeout=ACK_TIMEOUT):
+    """
+    The function runs a write statement through the write queue and returns (lastrowid, rowcount) once it is
+    committed. Errors of the statement (e.g. sqlite3.IntegrityError) are raised here, in the caller.
+    """
+    return get_queue().submit(statement, params).result(timeout)
+
+
+def insert(table, values, timeout=ACK_TIMEOUT):
+    """
+    The function inserts one row (a dict of column -> value) through the write queue and returns its rowid.
+    Table and column names come from our own models, never from the request.
+    """
+    columns = list(values)
+    statement = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                 f"VALUES ({', '.join('?' * len(columns))})")
+    return execute(statement, [values[column] for column in columns], timeout)[0]
@@ -0,0 +1,20 @@
+# Production WSGI entry point:
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#     gunicorn -c gunicorn.conf.py 'wsgi:create_app()'
+#
+# With preload_app (gunicorn.conf.py) this module is imported, and the app warmed up, once in the master.
+import health
+
+
+def create_app():
+    """
+    The function returns the application ready to serve: the Flask app of app.py, warmed up (see health.warm_up).
+    The routes are registered when app.py is imported, so every call returns the same app of this process.
+    """
+    from app import app
+    health.warm_up(app)
+    return app
+
+
+app = create_app()